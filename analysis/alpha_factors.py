@@ -44,40 +44,111 @@ def _clip_int(value, low=0, high=100, default=50) -> int:
 
 
 # ----------------------------------------------------------
-# HELPER: ATR Calculation
+# FEATURE CONTEXT: derived series memoized per OHLCV frame
 # ----------------------------------------------------------
-def compute_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
+class FeatureContext:
     """
-    Average True Range (ATR) using High/Low/Close.
+    Wraps one OHLCV frame and lazily memoizes the series derived from it
+    (normalized columns, true range, ATR, moving averages, volume stats).
 
-    Returns a Series aligned with df index.
+    Build it once per ticker and pass it to the factor and target functions
+    in place of the DataFrame, so shared rolling work runs only once.
     """
-    high = _to_series(df.get("High"))
-    low = _to_series(df.get("Low"))
-    close = _to_series(df.get("Close"))
 
-    if high is None or low is None or close is None:
-        return pd.Series(index=df.index, dtype=float)
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._cache: dict = {}
+
+    @classmethod
+    def of(cls, df: "pd.DataFrame | FeatureContext") -> "FeatureContext":
+        return df if isinstance(df, cls) else cls(df)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @property
+    def index(self) -> pd.Index:
+        return self.df.index
+
+    def _memo(self, key, fn):
+        if key not in self._cache:
+            self._cache[key] = fn()
+        return self._cache[key]
+
+    def column(self, name: str) -> pd.Series | None:
+        return self._memo(("col", name), lambda: _to_series(self.df.get(name)))
+
+    @property
+    def close(self) -> pd.Series | None:
+        return self.column("Close")
+
+    @property
+    def high(self) -> pd.Series | None:
+        return self.column("High")
+
+    @property
+    def low(self) -> pd.Series | None:
+        return self.column("Low")
 
-    tr1 = high - low
-    tr2 = (high - close.shift(1)).abs()
-    tr3 = (low - close.shift(1)).abs()
+    @property
+    def volume(self) -> pd.Series | None:
+        return self.column("Volume")
+
+    def true_range(self) -> pd.Series | None:
+        def build():
+            high, low, close = self.high, self.low, self.close
+            if high is None or low is None or close is None:
+                return None
+            prev_close = close.shift(1)
+            tr1 = high - low
+            tr2 = (high - prev_close).abs()
+            tr3 = (low - prev_close).abs()
+            return pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+
+        return self._memo("tr", build)
+
+    def atr(self, period: int = 14) -> pd.Series:
+        def build():
+            tr = self.true_range()
+            if tr is None:
+                return pd.Series(index=self.index, dtype=float)
+            return tr.rolling(period).mean()
+
+        return self._memo(("atr", period), build)
+
+    def close_ma(self, window: int = 50) -> pd.Series:
+        return self._memo(("close_ma", window), lambda: self.close.rolling(window).mean())
+
+    def volume_mean(self, window: int = 20) -> pd.Series:
+        return self._memo(("vol_mean", window), lambda: self.volume.rolling(window).mean())
+
+    def volume_std(self, window: int = 20) -> pd.Series:
+        return self._memo(("vol_std", window), lambda: self.volume.rolling(window).std())
+
+
+# ----------------------------------------------------------
+# HELPER: ATR Calculation
+# ----------------------------------------------------------
+def compute_atr(df: pd.DataFrame | FeatureContext, period: int = 14) -> pd.Series:
+    """
+    Average True Range (ATR) using High/Low/Close.
 
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    atr = tr.rolling(period).mean()
-    return atr
+    Returns a Series aligned with df index.
+    """
+    return FeatureContext.of(df).atr(period)
 
 
 # ----------------------------------------------------------
 # MOMENTUM SCORE (0-100)
 # % above 50-day moving average
 # ----------------------------------------------------------
-def momentum_score(df: pd.DataFrame) -> int:
-    close = _to_series(df.get("Close"))
+def momentum_score(df: pd.DataFrame | FeatureContext) -> int:
+    ctx = FeatureContext.of(df)
+    close = ctx.close
     if close is None or len(close) < 60:
         return 50
 
-    ma50 = close.rolling(50).mean()
+    ma50 = ctx.close_ma(50)
     denom = ma50.replace(0, np.nan)
 
     pct = (close - ma50) / denom * 100.0
@@ -87,12 +158,82 @@ def momentum_score(df: pd.DataFrame) -> int:
     return _clip_int(last_pct * 2, 0, 100, default=50)
 
 
+# ----------------------------------------------------------
+# HELPER: Rolling regression slope (running sums, O(n))
+# ----------------------------------------------------------
+def rolling_slope(values, window: int = 20) -> np.ndarray:
+    """
+    Least-squares slope of every trailing `window`-bar segment against
+    x = 0..window-1, for each bar of a 1D series or each column of a
+    (dates, tickers) panel.
+
+    Uses running sums of y and i*y instead of refitting each window.
+    Bars without a full window, or whose window holds a NaN, are NaN.
+    """
+    y = np.asarray(values, dtype=float)
+    out = np.full(y.shape, np.nan)
+    n = y.shape[0]
+    if window < 2 or n < window:
+        return out
+
+    # shift by the last value to keep the running sums small (slope is unchanged)
+    ref = np.where(np.isfinite(y[-1]), y[-1], 0.0)
+    missing = ~np.isfinite(y)
+    yc = np.where(missing, 0.0, y - ref)
+
+    i = np.arange(n, dtype=float).reshape((-1,) + (1,) * (y.ndim - 1))
+    pad = np.zeros((1,) + y.shape[1:])
+    c_y = np.concatenate([pad, np.cumsum(yc, axis=0)])
+    c_iy = np.concatenate([pad, np.cumsum(i * yc, axis=0)])
+    c_nan = np.concatenate([pad, np.cumsum(missing, axis=0)])
+
+    start = np.arange(n - window + 1, dtype=float).reshape((-1,) + (1,) * (y.ndim - 1))
+    s_y = c_y[window:] - c_y[:-window]
+    s_iy = c_iy[window:] - c_iy[:-window]
+    s_xy = s_iy - start * s_y  # sum of k * y over the window, k = 0..window-1
+
+    x_mean = (window - 1) / 2.0
+    s_xx = window * (window * window - 1) / 12.0
+    slope = (s_xy - x_mean * s_y) / s_xx
+
+    slope[(c_nan[window:] - c_nan[:-window]) > 0] = np.nan
+    out[window - 1 :] = slope
+    return out
+
+
+def rolling_trend_score(close, window: int = 20, min_rows: int = 25) -> np.ndarray:
+    """
+    trend_strength() for every bar: slope of the trailing `window` closes
+    relative to that bar's close, scaled and clipped to 0..100 (50 when undefined).
+    Works on a 1D series or a (dates, tickers) panel.
+    """
+    c = np.asarray(close, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw = rolling_slope(c, window) / c * 50000
+
+    score = np.full(c.shape, 50, dtype=int)
+    ok = np.isfinite(raw)
+    ok[: min_rows - 1] = False
+    score[ok] = np.clip(raw[ok], 0, 100).astype(int)
+    return score
+
+
+def trend_strength_series(df: pd.DataFrame | FeatureContext, window: int = 20) -> pd.Series:
+    """
+    Historical trend_strength scores, one per bar, without refitting each window.
+    """
+    close = FeatureContext.of(df).close
+    if close is None:
+        return pd.Series(index=df.index, dtype=int)
+    return pd.Series(rolling_trend_score(close.to_numpy(dtype=float), window), index=close.index)
+
+
 # ----------------------------------------------------------
 # TREND STRENGTH SCORE (0-100)
 # Based on slope of 20-day regression
 # ----------------------------------------------------------
-def trend_strength(df: pd.DataFrame) -> int:
-    close = _to_series(df.get("Close"))
+def trend_strength(df: pd.DataFrame | FeatureContext) -> int:
+    close = FeatureContext.of(df).close
     if close is None or len(close) < 25:
         return 50
 
@@ -100,12 +241,9 @@ def trend_strength(df: pd.DataFrame) -> int:
     if len(window) < 10:
         return 50
 
-    x = np.arange(len(window))
     y = window.values
-
-    try:
-        slope = np.polyfit(x, y, 1)[0]
-    except Exception:
+    slope = rolling_slope(y, len(y))[-1]
+    if not np.isfinite(slope):
         return 50
 
     # normalize relative to last price
@@ -121,13 +259,14 @@ def trend_strength(df: pd.DataFrame) -> int:
 # VOLUME DIVERGENCE SCORE (0-100)
 # Volume Z-score
 # ----------------------------------------------------------
-def volume_divergence(df: pd.DataFrame) -> int:
-    vol = _to_series(df.get("Volume"))
+def volume_divergence(df: pd.DataFrame | FeatureContext) -> int:
+    ctx = FeatureContext.of(df)
+    vol = ctx.volume
     if vol is None or len(vol) < 25:
         return 50
 
-    ma20 = vol.rolling(20).mean()
-    std20 = vol.rolling(20).std()
+    ma20 = ctx.volume_mean(20)
+    std20 = ctx.volume_std(20)
 
     last_vol = vol.iloc[-1]
     last_ma = ma20.iloc[-1]
@@ -145,12 +284,13 @@ def volume_divergence(df: pd.DataFrame) -> int:
 # VOLATILITY ADJUSTED SCORE (0-100)
 # Lower ATR% = Higher score
 # ----------------------------------------------------------
-def volatility_adjusted(df: pd.DataFrame) -> int:
-    close = _to_series(df.get("Close"))
+def volatility_adjusted(df: pd.DataFrame | FeatureContext) -> int:
+    ctx = FeatureContext.of(df)
+    close = ctx.close
     if close is None or len(close) < 20:
         return 50
 
-    atr_series = compute_atr(df)
+    atr_series = ctx.atr()
     atr = atr_series.iloc[-1]
     last_close = close.iloc[-1]
 
@@ -178,11 +318,12 @@ def compute_alpha_factors(ticker: str, lookback: int = 200):
     if df is None or len(df) < 60:
         return None
 
-    close = _to_series(df.get("Close"))
+    ctx = FeatureContext(df)
+    close = ctx.close
     if close is None or len(close) < 60:
         return None
 
-    atr_series = compute_atr(df)
+    atr_series = ctx.atr()
     atr = atr_series.iloc[-1]
     last_close = close.iloc[-1]
 
@@ -193,9 +334,9 @@ def compute_alpha_factors(ticker: str, lookback: int = 200):
 
     return {
         "ticker": ticker,
-        "momentum": momentum_score(df),
-        "trend_strength": trend_strength(df),
-        "volume": volume_divergence(df),
-        "vol_adj": volatility_adjusted(df),
+        "momentum": momentum_score(ctx),
+        "trend_strength": trend_strength(ctx),
+        "volume": volume_divergence(ctx),
+        "vol_adj": volatility_adjusted(ctx),
         "atr_percent": round(float(atr_pct), 2) if not pd.isna(atr_pct) else None,
     }
@@ -0,0 +1,201 @@
+# analysis/factor_panel.py
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.alpha_factors import rolling_slope
+
+
+PANEL_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+ADJ_CLOSE = "Adj Close"  # split/dividend-adjusted close, for return computation
+
+# Minimum rows per factor, mirroring analysis/alpha_factors.py
+MOMENTUM_MIN_ROWS = 60
+TREND_MIN_ROWS = 25
+VOLUME_MIN_ROWS = 25
+VOL_ADJ_MIN_ROWS = 20
+
+MA_WINDOW = 50
+TREND_WINDOW = 20
+VOLUME_WINDOW = 20
+ATR_PERIOD = 14
+
+
+class PricePanel:
+    """
+    Aligned OHLCV arrays for a universe, shaped (dates, tickers).
+    Missing bars are NaN. `adj_close` is the adjusted close where the frames
+    carry one, and the raw close otherwise.
+    """
+
+    def __init__(self, tickers: List[str], dates: pd.DatetimeIndex, open_, high, low, close, volume, adj_close=None):
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.adj_close = close if adj_close is None else adj_close
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame]) -> "PricePanel":
+        """
+        Builds a panel from per-ticker OHLCV frames (e.g. the job's downloads).
+        """
+        tickers = list(frames)
+        if not tickers:
+            empty = np.empty((0, 0))
+            return cls([], pd.DatetimeIndex([]), empty, empty, empty, empty, empty)
+
+        dates = pd.DatetimeIndex(np.unique(np.concatenate([frames[t].index.values for t in tickers])))
+
+        # one (fields + adjusted close, dates, tickers) block, filled a ticker column at a time
+        data = np.full((len(PANEL_FIELDS) + 1, len(dates), len(tickers)), np.nan)
+        positions: Dict[tuple, List[int]] = {}
+        for j, t in enumerate(tickers):
+            df = frames[t]
+            # frames usually share a column layout, so look the positions up once
+            names = tuple(df.columns.get_level_values(0))
+            if names not in positions:
+                adj = names.index(ADJ_CLOSE) if ADJ_CLOSE in names else names.index("Close")
+                positions[names] = [names.index(f) for f in PANEL_FIELDS] + [adj]
+            block = df.to_numpy(dtype=float)[:, positions[names]].T
+            if len(df.index) == len(dates):
+                data[:, :, j] = block
+            else:
+                data[:, dates.get_indexer(df.index), j] = block
+
+        return cls(tickers, dates, *data)
+
+
+# ----------------------------------------------------------
+# INTERNAL HELPERS
+# ----------------------------------------------------------
+def _bottom_align(valid: np.ndarray, *arrays: np.ndarray) -> List[np.ndarray]:
+    """
+    Moves each ticker's valid rows to the bottom of its column, keeping their
+    order. The last k rows of a column are then exactly the last k rows of
+    that ticker's dropna()'d frame, which is what the per-ticker functions see.
+    """
+    order = np.argsort(valid, axis=0, kind="stable")
+    return [np.take_along_axis(a, order, axis=0) for a in arrays]
+
+
+def _clip_int(values: np.ndarray, low=0, high=100, default=50) -> np.ndarray:
+    """
+    Vectorized alpha_factors._clip_int: NaN/inf -> default, else clip and truncate.
+    """
+    out = np.full(values.shape, default, dtype=int)
+    ok = np.isfinite(values)
+    out[ok] = np.clip(values[ok], low, high).astype(int)
+    return out
+
+
+# ----------------------------------------------------------
+# PANEL FACTOR ENGINE
+# ----------------------------------------------------------
+def compute_factor_panel(high, low, close, volume, open_=None) -> Dict[str, np.ndarray]:
+    """
+    Computes momentum, trend strength, volume divergence, volatility-adjusted
+    score, ATR and ATR% for every ticker of a (dates, tickers) panel in one pass.
+
+    Rows with any missing field are dropped per ticker, as the job does with
+    df.dropna(). Scores match the per-ticker functions in alpha_factors.
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+
+    valid = np.isfinite(high) & np.isfinite(low) & np.isfinite(close) & np.isfinite(volume)
+    if open_ is not None:
+        valid &= np.isfinite(np.asarray(open_, dtype=float))
+
+    n_tickers = close.shape[1]
+    rows = valid.sum(axis=0)
+
+    # only the trailing MA_WINDOW rows are ever needed once the data is aligned
+    tail = min(MA_WINDOW, close.shape[0])
+    high, low, close, volume = (a[-tail:] for a in _bottom_align(valid, high, low, close, volume))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        last_close = close[-1] if tail else np.full(n_tickers, np.nan)
+
+        # MOMENTUM: % above 50-day moving average
+        momentum = np.full(n_tickers, 50, dtype=int)
+        ok = rows >= MOMENTUM_MIN_ROWS
+        if ok.any():
+            ma50 = close[-MA_WINDOW:, ok].mean(axis=0)
+            ma50[ma50 == 0] = np.nan
+            momentum[ok] = _clip_int((last_close[ok] - ma50) / ma50 * 100.0 * 2)
+
+        # TREND STRENGTH: slope of 20-day regression relative to last price
+        trend = np.full(n_tickers, 50, dtype=int)
+        ok = (rows >= TREND_MIN_ROWS) & np.isfinite(last_close) & (last_close != 0)
+        if ok.any():
+            slope = rolling_slope(close[-TREND_WINDOW:, ok], TREND_WINDOW)[-1]
+            trend[ok] = _clip_int(slope / last_close[ok] * 50000)
+
+        # VOLUME DIVERGENCE: z-score of the last volume vs the 20-day window
+        vol_div = np.full(n_tickers, 50, dtype=int)
+        ok = rows >= VOLUME_MIN_ROWS
+        if ok.any():
+            window = volume[-VOLUME_WINDOW:, ok]
+            mean = window.mean(axis=0)
+            std = window.std(axis=0, ddof=1)
+            z = (window[-1] - mean) / std
+            z[~(std > 0)] = np.nan
+            vol_div[ok] = _clip_int((z + 2) * 25)
+
+        # ATR% and VOLATILITY ADJUSTED (lower ATR% = higher score)
+        atr = np.full(n_tickers, np.nan)
+        atr_pct = np.full(n_tickers, np.nan)
+        ok = rows > ATR_PERIOD
+        if ok.any():
+            prev_close = close[-ATR_PERIOD - 1 : -1, ok]
+            h = high[-ATR_PERIOD:, ok]
+            l = low[-ATR_PERIOD:, ok]
+            tr = np.maximum(h - l, np.maximum(np.abs(h - prev_close), np.abs(l - prev_close)))
+            atr[ok] = tr.mean(axis=0)
+            atr_pct[ok] = atr[ok] / last_close[ok] * 100.0
+        atr_pct[~np.isfinite(atr_pct)] = np.nan
+
+        vol_adj = np.full(n_tickers, 50, dtype=int)
+        ok = (rows >= VOL_ADJ_MIN_ROWS) & (atr_pct > 0)
+        if ok.any():
+            vol_adj[ok] = _clip_int(100 - np.minimum(atr_pct[ok] * 10, 100))
+
+        avg_vol_20d = np.full(n_tickers, np.nan)
+        ok = rows >= VOLUME_WINDOW
+        if ok.any():
+            avg_vol_20d[ok] = volume[-VOLUME_WINDOW:, ok].mean(axis=0)
+
+    return {
+        "momentum": momentum,
+        "trend_strength": trend,
+        "volume": vol_div,
+        "vol_adj": vol_adj,
+        "atr": atr,
+        "atr_percent": atr_pct,
+        "last_price": np.where(rows > 0, last_close, np.nan),
+        "avg_vol_20d": avg_vol_20d,
+        "rows": rows,
+    }
+
+
+def score_panel(panel: PricePanel) -> pd.DataFrame:
+    """
+    Convenience wrapper: one row of factor values per ticker.
+    """
+    out = compute_factor_panel(panel.high, panel.low, panel.close, panel.volume, open_=panel.open)
+    return pd.DataFrame(out, index=pd.Index(panel.tickers, name="ticker"))
+
+
+def score_frames(frames: Dict[str, pd.DataFrame], tickers: Optional[List[str]] = None) -> pd.DataFrame:
+    if tickers is not None:
+        frames = {t: frames[t] for t in tickers if t in frames}
+    return score_panel(PricePanel.from_frames(frames))
@@ -1,17 +1,28 @@
 import numpy as np
 import yfinance as yf
-from analysis.alpha_factors import compute_atr
+from analysis.alpha_factors import FeatureContext
 
 
 def compute_price_targets_from_df(df):
+    """
+    df: OHLCV DataFrame or a FeatureContext built from one.
+    """
     if df is None or len(df) < 20:
         return None
 
-    close = df["Close"].iloc[-1]
+    ctx = FeatureContext.of(df)
+    close = ctx.close.iloc[-1]
 
-    atr_series = compute_atr(df)
+    atr_series = ctx.atr()
     atr = atr_series.iloc[-1]
 
+    return price_targets_from_levels(close, atr)
+
+
+def price_targets_from_levels(close, atr):
+    """
+    Buy zone, take-profits and stop from the last close and ATR.
+    """
     buy_low = round(close - (0.5 * atr), 2)
     buy_high = round(close + (0.2 * atr), 2)
 
@@ -0,0 +1,13 @@
+# analysis/ranking.py
+from __future__ import annotations
+
+from typing import Dict
+
+
+def rank_key(item: Dict):
+    # alpha_score desc, then atr_percent asc (prefer lower vol), then ticker for a stable order
+    return (
+        -int(item["alpha_score"]),
+        float((item.get("factors") or {}).get("atr_percent") or 9999),
+        item["ticker"],
+    )
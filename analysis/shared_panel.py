@@ -0,0 +1,152 @@
+# analysis/shared_panel.py
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.factor_panel import PANEL_FIELDS, PricePanel, compute_factor_panel
+
+
+class SharedPanel:
+    """
+    A PricePanel's OHLCV block, shaped (fields, dates, tickers), placed in
+    one multiprocessing.shared_memory segment. Workers attach by name through
+    `handle` (a small picklable tuple) and read the arrays without copying.
+
+    The creating process owns the segment: use as a context manager, or
+    call close() and unlink() when done.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, int, int], tickers: List[str], dates, owner: bool):
+        self.shm = shm
+        self.shape = shape
+        self.tickers = tickers
+        self.dates = dates
+        self.owner = owner
+        self.data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+    @classmethod
+    def from_panel(cls, panel: PricePanel) -> "SharedPanel":
+        block = np.stack([panel.open, panel.high, panel.low, panel.close, panel.volume])
+        shm = shared_memory.SharedMemory(create=True, size=max(block.nbytes, 1))
+        shared = cls(shm, block.shape, panel.tickers, panel.dates, owner=True)
+        shared.data[...] = block
+        return shared
+
+    @property
+    def handle(self) -> Tuple[str, Tuple[int, int, int]]:
+        return self.shm.name, self.shape
+
+    @classmethod
+    def attach(cls, handle: Tuple[str, Tuple[int, int, int]]) -> "SharedPanel":
+        name, shape = handle
+        return cls(shared_memory.SharedMemory(name=name), shape, [], None, owner=False)
+
+    def field(self, name: str) -> np.ndarray:
+        return self.data[PANEL_FIELDS.index(name)]
+
+    def close(self) -> None:
+        self.data = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> "SharedPanel":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        self.unlink()
+
+
+# ----------------------------------------------------------
+# WORKERS
+# ----------------------------------------------------------
+def _score_range(handle, start: int, stop: int) -> Dict[str, np.ndarray]:
+    """
+    Factor arrays for tickers [start, stop) of a shared panel.
+    """
+    shared = SharedPanel.attach(handle)
+    try:
+        sl = np.s_[:, start:stop]
+        return compute_factor_panel(
+            shared.field("High")[sl],
+            shared.field("Low")[sl],
+            shared.field("Close")[sl],
+            shared.field("Volume")[sl],
+            open_=shared.field("Open")[sl],
+        )
+    finally:
+        shared.close()
+
+
+def ticker_ranges(n_tickers: int, parts: int) -> List[Tuple[int, int]]:
+    size = max(1, math.ceil(n_tickers / max(parts, 1)))
+    return [(i, min(i + size, n_tickers)) for i in range(0, n_tickers, size)]
+
+
+def map_shared(
+    shared: SharedPanel,
+    fn: Callable,
+    tasks: List[tuple],
+    workers: int,
+    executor: Optional[ProcessPoolExecutor] = None,
+    on_result: Optional[Callable[[int, object], None]] = None,
+) -> List:
+    """
+    Runs fn(shared.handle, *task) for every task, in a process pool when
+    workers > 1 (spawned, so no lock held by a job thread leaks into a
+    child), else inline. fn must be a module-level function.
+
+    on_result(i, result) is called as each result arrives, in task order.
+    """
+    if not tasks:
+        return []
+    if executor is None and workers <= 1:
+        results = (fn(shared.handle, *task) for task in tasks)
+        return _collect(results, on_result)
+    args = [(shared.handle, *task) for task in tasks]
+    if executor is not None:
+        return _collect(executor.map(fn, *zip(*args)), on_result)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        return _collect(pool.map(fn, *zip(*args)), on_result)
+
+
+def _collect(results, on_result) -> List:
+    out = []
+    for i, result in enumerate(results):
+        out.append(result)
+        if on_result is not None:
+            on_result(i, result)
+    return out
+
+
+def score_shared_panel(shared: SharedPanel, workers: int = 1, chunks_per_worker: int = 2) -> Dict[str, np.ndarray]:
+    """
+    compute_factor_panel over a shared panel, split into ticker ranges across
+    `workers` processes. Returns the same dict of per-ticker arrays.
+    """
+    n = shared.shape[2]
+    if n == 0:
+        return compute_factor_panel(*(np.empty((0, 0)) for _ in range(4)))
+    ranges = ticker_ranges(n, max(workers, 1) * chunks_per_worker if workers > 1 else 1)
+    parts = map_shared(shared, _score_range, ranges, workers)
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def score_frames_parallel(frames: Dict[str, pd.DataFrame], workers: int = 1) -> pd.DataFrame:
+    """
+    score_frames() through a shared-memory panel and a process pool.
+    """
+    panel = PricePanel.from_frames(frames)
+    with SharedPanel.from_panel(panel) as shared:
+        out = score_shared_panel(shared, workers)
+    return pd.DataFrame(out, index=pd.Index(panel.tickers, name="ticker"))
@@ -0,0 +1,318 @@
+# analysis/streaming_factors.py
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.alpha_factors import FeatureContext
+
+
+STATE_DIR = Path("cache") / "factor_state"
+
+MA_WINDOW = 50
+TREND_WINDOW = 20
+VOLUME_WINDOW = 20
+ATR_PERIOD = 14
+
+
+def _clip_int(value: float, low=0, high=100, default=50) -> int:
+    if value is None or not math.isfinite(value):
+        return int(default)
+    return int(min(max(value, low), high))
+
+
+class StreamingFactorState:
+    """
+    Per-ticker factor state that advances in O(1) per new daily bar.
+
+    Holds ring buffers of the last closes / volumes / true ranges with their
+    running sums, the running sums of the 20-bar regression (sum y, sum k*y)
+    and a sliding Welford mean/variance of volume. Scores mirror
+    alpha_factors on a dropna()'d frame of the same bars.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_date: Optional[str] = None
+        self.prev_close: Optional[float] = None
+        self.bars_since_rebuild = 0
+
+        self.closes: deque = deque(maxlen=MA_WINDOW)
+        self.close_sum = 0.0
+
+        self.trend_y: deque = deque(maxlen=TREND_WINDOW)
+        self.trend_sy = 0.0
+        self.trend_sxy = 0.0
+
+        self.volumes: deque = deque(maxlen=VOLUME_WINDOW)
+        self.vol_mean = 0.0
+        self.vol_m2 = 0.0
+
+        self.trs: deque = deque(maxlen=ATR_PERIOD)
+        self.tr_sum = 0.0
+
+    # ---------------------------------------------------------
+    # Building
+    # ---------------------------------------------------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame | FeatureContext) -> "StreamingFactorState":
+        """
+        Full rebuild: seeds every buffer and sum directly from the trailing
+        windows of the frame (no accumulated rounding).
+        """
+        ctx = FeatureContext.of(df)
+        state = cls()
+        close = ctx.close.to_numpy(dtype=float)
+        volume = ctx.volume.to_numpy(dtype=float)
+        tr = ctx.true_range().to_numpy(dtype=float)
+
+        state.count = len(close)
+        if state.count == 0:
+            return state
+        state.last_date = pd.Timestamp(ctx.index[-1]).date().isoformat()
+        state.prev_close = float(close[-1])
+
+        state.closes.extend(close[-MA_WINDOW:].tolist())
+        state.close_sum = float(np.sum(close[-MA_WINDOW:]))
+
+        y = close[-TREND_WINDOW:]
+        state.trend_y.extend(y.tolist())
+        state.trend_sy = float(np.sum(y))
+        state.trend_sxy = float(np.arange(len(y)) @ y)
+
+        v = volume[-VOLUME_WINDOW:]
+        state.volumes.extend(v.tolist())
+        state.vol_mean = float(np.mean(v))
+        state.vol_m2 = float(np.sum((v - state.vol_mean) ** 2))
+
+        t = tr[-ATR_PERIOD:]
+        state.trs.extend(t.tolist())
+        state.tr_sum = float(np.sum(t))
+        return state
+
+    def update(self, date, high: float, low: float, close: float, volume: float) -> None:
+        """
+        Applies one new bar in constant time.
+        """
+        high, low, close, volume = float(high), float(low), float(close), float(volume)
+
+        # true range / ATR
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        if len(self.trs) == ATR_PERIOD:
+            self.tr_sum -= self.trs.popleft()
+        self.trs.append(tr)
+        self.tr_sum += tr
+
+        # 50-bar close sum (momentum)
+        if len(self.closes) == MA_WINDOW:
+            self.close_sum -= self.closes.popleft()
+        self.closes.append(close)
+        self.close_sum += close
+
+        # 20-bar regression sums; dropping y_0 shifts every remaining k down by one
+        if len(self.trend_y) == TREND_WINDOW:
+            y0 = self.trend_y.popleft()
+            self.trend_sy -= y0
+            self.trend_sxy -= self.trend_sy
+        self.trend_sxy += len(self.trend_y) * close
+        self.trend_sy += close
+        self.trend_y.append(close)
+
+        # sliding Welford over the last 20 volumes: remove the oldest, add the newest
+        if len(self.volumes) == VOLUME_WINDOW:
+            old = self.volumes.popleft()
+            d = old - self.vol_mean
+            self.vol_mean -= d / len(self.volumes)
+            self.vol_m2 -= d * (old - self.vol_mean)
+        self.volumes.append(volume)
+        d = volume - self.vol_mean
+        self.vol_mean += d / len(self.volumes)
+        self.vol_m2 += d * (volume - self.vol_mean)
+
+        self.prev_close = close
+        self.last_date = pd.Timestamp(date).date().isoformat()
+        self.count += 1
+        self.bars_since_rebuild += 1
+
+    def can_extend(self, df: pd.DataFrame | FeatureContext) -> bool:
+        """
+        True when the frame still contains this state's last bar with the same
+        close, i.e. new bars can be applied without a gap or a data revision.
+        """
+        if self.last_date is None or self.prev_close is None:
+            return False
+        close = FeatureContext.of(df).close
+        if close is None:
+            return False
+        hit = close[close.index == pd.Timestamp(self.last_date)]
+        return len(hit) == 1 and math.isclose(float(hit.iloc[0]), self.prev_close, rel_tol=1e-9)
+
+    # ---------------------------------------------------------
+    # Scores (same rules as analysis/alpha_factors.py)
+    # ---------------------------------------------------------
+    def atr(self) -> float:
+        if len(self.trs) < ATR_PERIOD:
+            return float("nan")
+        return self.tr_sum / ATR_PERIOD
+
+    def momentum_score(self) -> int:
+        if self.count < 60:
+            return 50
+        ma50 = self.close_sum / MA_WINDOW
+        if ma50 == 0:
+            return 50
+        return _clip_int((self.prev_close - ma50) / ma50 * 100.0 * 2)
+
+    def trend_strength(self) -> int:
+        n = len(self.trend_y)
+        if self.count < 25 or n < 10:
+            return 50
+        x_mean = (n - 1) / 2.0
+        s_xx = n * (n * n - 1) / 12.0
+        slope = (self.trend_sxy - x_mean * self.trend_sy) / s_xx
+        last_price = self.prev_close
+        if not last_price or not math.isfinite(last_price):
+            return 50
+        return _clip_int(slope / last_price * 50000)
+
+    def volume_divergence(self) -> int:
+        n = len(self.volumes)
+        if self.count < 25 or n < 2:
+            return 50
+        std = math.sqrt(max(self.vol_m2, 0.0) / (n - 1))
+        if std == 0 or not math.isfinite(std):
+            return 50
+        z = (self.volumes[-1] - self.vol_mean) / std
+        return _clip_int((z + 2) * 25)
+
+    def volatility_adjusted(self) -> int:
+        if self.count < 20:
+            return 50
+        atr = self.atr()
+        if not math.isfinite(atr) or not self.prev_close:
+            return 50
+        atr_pct = atr / self.prev_close * 100.0
+        if atr_pct <= 0 or not math.isfinite(atr_pct):
+            return 50
+        return _clip_int(100 - min(atr_pct * 10, 100))
+
+    def factors(self) -> Dict:
+        return {
+            "momentum": self.momentum_score(),
+            "trend_strength": self.trend_strength(),
+            "volume": self.volume_divergence(),
+            "vol_adj": self.volatility_adjusted(),
+            "atr": self.atr(),
+            "last_price": self.prev_close,
+            "avg_vol_20d": self.vol_mean if self.volumes else None,
+        }
+
+    # ---------------------------------------------------------
+    # Persistence
+    # ---------------------------------------------------------
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "last_date": self.last_date,
+            "prev_close": self.prev_close,
+            "bars_since_rebuild": self.bars_since_rebuild,
+            "closes": list(self.closes),
+            "close_sum": self.close_sum,
+            "trend_y": list(self.trend_y),
+            "trend_sy": self.trend_sy,
+            "trend_sxy": self.trend_sxy,
+            "volumes": list(self.volumes),
+            "vol_mean": self.vol_mean,
+            "vol_m2": self.vol_m2,
+            "trs": list(self.trs),
+            "tr_sum": self.tr_sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "StreamingFactorState":
+        state = cls()
+        for key, value in data.items():
+            current = getattr(state, key, None)
+            if isinstance(current, deque):
+                current.extend(value)
+            else:
+                setattr(state, key, value)
+        return state
+
+
+class FactorStateStore:
+    """
+    One JSON file per ticker under cache/factor_state, replaced atomically.
+    """
+
+    def __init__(self, root: Path | str = STATE_DIR):
+        self.root = Path(root)
+
+    def path(self, ticker: str) -> Path:
+        return self.root / f"{ticker.upper()}.json"
+
+    def load(self, ticker: str) -> Optional[StreamingFactorState]:
+        try:
+            with open(self.path(ticker)) as f:
+                return StreamingFactorState.from_dict(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, ticker: str, state: StreamingFactorState) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(ticker)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp, path)
+
+    def evict(self, tickers) -> int:
+        removed = 0
+        for t in tickers:
+            try:
+                self.path(t).unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+def advance_state(
+    store: FactorStateStore,
+    ticker: str,
+    df: pd.DataFrame | FeatureContext,
+    rebuild_every: int = 20,
+) -> StreamingFactorState:
+    """
+    Loads yesterday's state and applies only the bars after its last date.
+    Falls back to a full rebuild on a gap, a data revision, or every
+    `rebuild_every` incremental bars to flush floating-point drift.
+    """
+    ctx = FeatureContext.of(df)
+    state = store.load(ticker)
+
+    if state is not None and state.bars_since_rebuild < rebuild_every and state.can_extend(ctx):
+        index = ctx.index
+        new = np.flatnonzero(index > pd.Timestamp(state.last_date))
+        if state.bars_since_rebuild + len(new) <= rebuild_every:
+            high, low, close, volume = ctx.high, ctx.low, ctx.close, ctx.volume
+            for i in new:
+                state.update(index[i], high.iloc[i], low.iloc[i], close.iloc[i], volume.iloc[i])
+            if len(new):
+                store.save(ticker, state)
+            return state
+
+    state = StreamingFactorState.from_frame(ctx)
+    store.save(ticker, state)
+    return state
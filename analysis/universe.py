@@ -1,23 +1,58 @@
 # analysis/universe.py
 from __future__ import annotations
 
+import datetime as dt
+import hashlib
+import io
+import json
+import logging
 import os
+import pickle
+import threading
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
 import pandas as pd
 import requests
 
 
-CACHE_PATH = Path(__file__).with_name("_cache_sp500.csv")
+logger = logging.getLogger(__name__)
+
+# Committed snapshot, used until the first successful refresh
+SEED_PATH = Path(__file__).with_name("_cache_sp500.csv")
+# sector -> tickers index + refresh metadata, rebuilt whenever the CSV's content changes
+INDEX_PATH = Path("cache") / "universe" / "sp500_index.pkl"
+# Refreshed CSV, kept next to the index so both are cached (and restored) together
+CACHE_PATH = INDEX_PATH.with_name("sp500.csv")
 
 # Source 1 (CSV) - usually easiest/most stable
 DATAHUB_SP500_CSV = "https://datahub.io/core/s-and-p-500-companies/r/constituents.csv"
 
 # Source 2 (HTML) - fallback
 WIKI_SP500_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+WIKI_TABLE_ID = "constituents"
+
+# Refresh at most once per TTL (a failed attempt counts too)
+UNIVERSE_TTL = dt.timedelta(days=1)
+
+# A download is only accepted if it looks like the real index
+MIN_UNIVERSE_ROWS = 400
+MIN_UNIVERSE_SECTORS = 8
+MIN_KEEP_FRACTION = 0.9  # vs the cached universe
 
+INDEX_VERSION = 2
 
-def _http_get(url: str, timeout: int = 30) -> str:
-    headers = {
+# Membership changes: one JSON line per refresh that changed anything, and
+# the universe snapshot each downstream consumer last synced with
+DIFF_LOG_PATH = INDEX_PATH.with_name("diffs.jsonl")
+CONSUMERS_DIR = INDEX_PATH.with_name("consumers")
+
+_MEMO: Dict = {}
+_LOCK = threading.Lock()
+
+
+def _http_get(url: str, timeout: int = 30, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    base = {
         # A more realistic browser UA reduces 403s
         "User-Agent": (
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -30,77 +65,346 @@ def _http_get(url: str, timeout: int = 30) -> str:
         "DNT": "1",
         "Upgrade-Insecure-Requests": "1",
     }
-    resp = requests.get(url, headers=headers, timeout=timeout)
+    base.update(headers or {})
+    resp = requests.get(url, headers=base, timeout=timeout)
     resp.raise_for_status()
-    return resp.text
+    return resp
 
 
-def load_sp500_universe(force_refresh: bool = False) -> pd.DataFrame:
+def _now() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+# ----------------------------------------------------------
+# SOURCES
+# ----------------------------------------------------------
+def _fetch_datahub(etag: Optional[str] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """
-    Returns a DataFrame with at least:
-      - Symbol
-      - Security (if available)
-      - GICS Sector (or Sector)
-    Uses cache to avoid repeated network calls.
+    Conditional GET of the DataHub CSV. Returns (None, etag) when the
+    server says it has not changed since `etag`.
     """
-    if CACHE_PATH.exists() and not force_refresh:
-        return pd.read_csv(CACHE_PATH)
+    resp = _http_get(DATAHUB_SP500_CSV, headers={"If-None-Match": etag} if etag else None)
+    if resp.status_code == 304:
+        return None, etag
 
-    # ---- Try Source 1: DataHub CSV ----
-    try:
-        df = pd.read_csv(DATAHUB_SP500_CSV)
-        # DataHub columns: Symbol, Name, Sector
-        df = df.rename(columns={"Name": "Security", "Sector": "GICS Sector"})
-        df["Symbol"] = df["Symbol"].astype(str).str.strip()
-        df["GICS Sector"] = df["GICS Sector"].astype(str).str.strip()
-        df.to_csv(CACHE_PATH, index=False)
-        return df
-    except Exception:
-        pass
+    df = pd.read_csv(io.StringIO(resp.text))
+    # DataHub columns: Symbol, Name, Sector
+    df = df.rename(columns={"Name": "Security", "Sector": "GICS Sector"})
+    df["Symbol"] = df["Symbol"].astype(str).str.strip()
+    df["GICS Sector"] = df["GICS Sector"].astype(str).str.strip()
+    return df, resp.headers.get("ETag")
 
-    # ---- Try Source 2: Wikipedia HTML ----
-    try:
-        html = _http_get(WIKI_SP500_URL)
-        tables = pd.read_html(html)
-        df = tables[0].copy()
 
-        # Normalize column names
-        df.columns = [str(c).strip() for c in df.columns]
+def _constituents_table_html(html: str) -> str:
+    """
+    Just the constituents <table> of the Wikipedia page, so read_html does
+    not parse every other table on it.
+    """
+    anchor = html.find(f'id="{WIKI_TABLE_ID}"')
+    if anchor < 0:
+        return html
+    start = html.rfind("<table", 0, anchor)
+    end = html.find("</table>", anchor)
+    if start < 0 or end < 0:
+        return html
+    return html[start : end + len("</table>")]
 
-        # Wikipedia columns typically include: Symbol, Security, GICS Sector, GICS Sub-Industry
-        if "Symbol" not in df.columns:
-            raise ValueError("Wikipedia table missing Symbol column")
 
-        # yfinance uses BRK-B not BRK.B
-        df["Symbol"] = df["Symbol"].astype(str).str.replace(".", "-", regex=False)
+def _fetch_wikipedia() -> pd.DataFrame:
+    html = _http_get(WIKI_SP500_URL).text
+    tables = pd.read_html(io.StringIO(_constituents_table_html(html)), attrs={"id": WIKI_TABLE_ID})
+    df = tables[0].copy()
 
-        # Make sure sector column exists
-        if "GICS Sector" not in df.columns and "Sector" in df.columns:
-            df = df.rename(columns={"Sector": "GICS Sector"})
+    # Normalize column names
+    df.columns = [str(c).strip() for c in df.columns]
 
-        df.to_csv(CACHE_PATH, index=False)
-        return df
-    except Exception as e:
-        raise RuntimeError(
-            f"Failed to load S&P 500 universe from both DataHub and Wikipedia. Last error: {e}"
-        )
+    # Wikipedia columns typically include: Symbol, Security, GICS Sector, GICS Sub-Industry
+    if "Symbol" not in df.columns:
+        raise ValueError("Wikipedia table missing Symbol column")
 
+    # yfinance uses BRK-B not BRK.B
+    df["Symbol"] = df["Symbol"].astype(str).str.replace(".", "-", regex=False)
+
+    # Make sure sector column exists
+    if "GICS Sector" not in df.columns and "Sector" in df.columns:
+        df = df.rename(columns={"Sector": "GICS Sector"})
+    return df
 
-def sector_to_tickers(force_refresh: bool = False) -> dict[str, list[str]]:
-    """
-    Maps GICS sector -> list of tickers.
-    """
-    df = load_sp500_universe(force_refresh=force_refresh)
 
+# ----------------------------------------------------------
+# INDEX
+# ----------------------------------------------------------
+def _build_index(df: pd.DataFrame) -> Dict[str, List[str]]:
     # Ensure expected columns
     if "GICS Sector" not in df.columns or "Symbol" not in df.columns:
         raise ValueError("Universe missing required columns: Symbol / GICS Sector")
 
-    mapping: dict[str, list[str]] = {}
+    mapping: Dict[str, List[str]] = {}
     for sector, group in df.groupby("GICS Sector"):
         tickers = group["Symbol"].dropna().astype(str).str.strip().tolist()
         # Remove empty strings
         tickers = [t for t in tickers if t]
         mapping[str(sector).strip()] = tickers
-
     return mapping
+
+
+def _looks_valid(df: pd.DataFrame, previous_rows: int) -> bool:
+    """
+    Rejects empty, truncated or mangled downloads.
+    """
+    if "GICS Sector" not in df.columns or "Symbol" not in df.columns:
+        return False
+    rows = int(df["Symbol"].dropna().astype(str).str.strip().ne("").sum())
+    sectors = df["GICS Sector"].dropna().nunique()
+    return (
+        rows >= MIN_UNIVERSE_ROWS
+        and sectors >= MIN_UNIVERSE_SECTORS
+        and rows >= previous_rows * MIN_KEEP_FRACTION
+    )
+
+
+# ----------------------------------------------------------
+# MEMBERSHIP DIFFS
+# ----------------------------------------------------------
+def _ticker_sectors(sectors: Dict[str, List[str]]) -> Dict[str, str]:
+    return {t: sector for sector, tickers in sectors.items() for t in tickers}
+
+
+def diff_universes(old: Dict[str, List[str]], new: Dict[str, List[str]]) -> Dict:
+    """
+    added / removed symbols and sector_changed {symbol: [old, new]} between
+    two sector -> tickers maps.
+    """
+    return _diff_ticker_maps(_ticker_sectors(old), _ticker_sectors(new))
+
+
+def _diff_ticker_maps(before: Dict[str, str], after: Dict[str, str]) -> Dict:
+    return {
+        "added": sorted(set(after) - set(before)),
+        "removed": sorted(set(before) - set(after)),
+        "sector_changed": {
+            t: [before[t], after[t]] for t in sorted(set(before) & set(after)) if before[t] != after[t]
+        },
+    }
+
+
+def _log_diff(diff: Dict, at: dt.datetime) -> None:
+    DIFF_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(DIFF_LOG_PATH, "a") as f:
+        f.write(json.dumps({"at": at.isoformat(), **diff}) + "\n")
+
+
+def _has_changes(diff: Dict) -> bool:
+    return bool(diff["added"] or diff["removed"] or diff["sector_changed"])
+
+
+def _consumer_path(consumer: str) -> Path:
+    return CONSUMERS_DIR / f"{consumer}.pkl"
+
+
+def last_universe_diff() -> Optional[Dict]:
+    """
+    The diff produced by the most recent refresh that changed the universe.
+    """
+    return _current_index().get("last_diff")
+
+
+def pending_universe_diff(consumer: str) -> Optional[Dict]:
+    """
+    Membership changes since `consumer` last called
+    mark_universe_diff_applied(), or None if there are none. Each consumer
+    keeps its own snapshot of ticker -> sector, so a missed refresh is never
+    lost. A new consumer starts from the current universe and sees no diff.
+    """
+    current = _ticker_sectors(_current_index()["sectors"])
+    try:
+        with open(_consumer_path(consumer), "rb") as f:
+            seen = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        mark_universe_diff_applied(consumer, {"snapshot": current})
+        return None
+
+    diff = _diff_ticker_maps(seen, current)
+    if not _has_changes(diff):
+        return None
+    diff["snapshot"] = current
+    return diff
+
+
+def mark_universe_diff_applied(consumer: str, diff: Dict) -> None:
+    """
+    Records that `consumer` is in sync with the universe the diff led to.
+    """
+    path = _consumer_path(consumer)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(diff["snapshot"], f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _read_index() -> Optional[Dict]:
+    try:
+        with open(INDEX_PATH, "rb") as f:
+            index = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return None
+    return index
+
+
+def _write_index(index: Dict) -> None:
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = INDEX_PATH.with_name(f"{INDEX_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, INDEX_PATH)
+
+
+def _csv_path() -> Path:
+    return CACHE_PATH if CACHE_PATH.exists() else SEED_PATH
+
+
+def _csv_hash() -> Optional[str]:
+    path = _csv_path()
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _index_from_csv(checked_at: dt.datetime, etag: Optional[str] = None) -> Dict:
+    df = pd.read_csv(_csv_path())
+    return {
+        "version": INDEX_VERSION,
+        "checked_at": checked_at,
+        "csv_hash": _csv_hash(),
+        "etag": etag,
+        "rows": len(df),
+        "sectors": _build_index(df),
+    }
+
+
+def _write_csv(df: pd.DataFrame) -> None:
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CACHE_PATH.with_name(f"{CACHE_PATH.name}.{os.getpid()}.tmp")
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, CACHE_PATH)
+
+
+def _with_diff(old: Optional[Dict], new: Dict) -> Dict:
+    """
+    Keeps the previous snapshot and the diff to it on the new index, and
+    logs the diff when membership actually changed.
+    """
+    if old is None:
+        return new
+    diff = diff_universes(old["sectors"], new["sectors"])
+    new["previous_sectors"] = old["sectors"]
+    new["last_diff"] = old.get("last_diff")
+    if _has_changes(diff):
+        new["last_diff"] = {"at": new["checked_at"].isoformat(), **diff}
+        _log_diff(diff, new["checked_at"])
+        logger.info(
+            "universe changed: %d added, %d removed, %d changed sector",
+            len(diff["added"]),
+            len(diff["removed"]),
+            len(diff["sector_changed"]),
+        )
+    return new
+
+
+def _refresh(index: Optional[Dict]) -> Dict:
+    """
+    Tries DataHub, then Wikipedia. A new universe replaces the cache only if
+    it passes _looks_valid; otherwise the old cache is kept. Either way the
+    attempt is recorded so the next one waits a full TTL.
+    """
+    previous_rows = index["rows"] if index else 0
+    etag = index.get("etag") if index else None
+    now = _now()
+
+    # ---- Try Source 1: DataHub CSV ----
+    try:
+        df, new_etag = _fetch_datahub(etag)
+        if df is None:
+            logger.info("universe unchanged (DataHub 304)")
+            return {**index, "checked_at": now}
+        if _looks_valid(df, previous_rows):
+            _write_csv(df)
+            return _with_diff(index, _index_from_csv(now, new_etag))
+        logger.warning("DataHub universe looks degenerate (%d rows), trying Wikipedia", len(df))
+    except Exception as e:
+        logger.warning("DataHub universe download failed: %s", e)
+
+    # ---- Try Source 2: Wikipedia HTML ----
+    try:
+        df = _fetch_wikipedia()
+        if _looks_valid(df, previous_rows):
+            _write_csv(df)
+            return _with_diff(index, _index_from_csv(now))
+        logger.warning("Wikipedia universe looks degenerate (%d rows)", len(df))
+    except Exception as e:
+        logger.warning("Wikipedia universe download failed: %s", e)
+
+    if not _csv_path().exists():
+        raise RuntimeError("Failed to load S&P 500 universe from both DataHub and Wikipedia.")
+    logger.warning("keeping the cached universe (%d rows)", previous_rows)
+    if index is not None and index.get("csv_hash") == _csv_hash():
+        return {**index, "checked_at": now}
+    return _index_from_csv(now)
+
+
+def _current_index(force_refresh: bool = False) -> Dict:
+    """
+    In-process memo -> on-disk index -> refresh, in that order.
+    """
+    now = _now()
+    memo = _MEMO.get("index")
+    if memo is not None and not force_refresh and now - memo["checked_at"] < UNIVERSE_TTL:
+        return memo
+
+    with _LOCK:
+        index = _read_index()
+        if index is not None and index.get("csv_hash") != _csv_hash():
+            # the CSV's content changed behind the index's back: re-index it, keep
+            # the refresh time, and drop the ETag so the next refresh is a full GET
+            index = _with_diff(index, _index_from_csv(index["checked_at"]))
+            _write_index(index)
+        if index is None and _csv_path().exists() and not force_refresh:
+            # first run with an existing CSV: index it; a refreshed CSV counts as
+            # checked now, the committed seed is refreshed right away
+            index = _index_from_csv(now if CACHE_PATH.exists() else now - UNIVERSE_TTL)
+            _write_index(index)
+
+        if index is None or force_refresh or now - index["checked_at"] >= UNIVERSE_TTL:
+            index = _refresh(index)
+            _write_index(index)
+
+        _MEMO["index"] = index
+        return index
+
+
+# ----------------------------------------------------------
+# PUBLIC API
+# ----------------------------------------------------------
+def load_sp500_universe(force_refresh: bool = False) -> pd.DataFrame:
+    """
+    Returns a DataFrame with at least:
+      - Symbol
+      - Security (if available)
+      - GICS Sector (or Sector)
+    The CSV cache is refreshed at most once per UNIVERSE_TTL.
+    """
+    _current_index(force_refresh)
+    return pd.read_csv(_csv_path())
+
+
+def sector_to_tickers(force_refresh: bool = False) -> dict[str, list[str]]:
+    """
+    Maps GICS sector -> list of tickers, from the precomputed index
+    (memoized in-process, so repeated calls do not touch the disk).
+    """
+    sectors = _current_index(force_refresh)["sectors"]
+    return {sector: list(tickers) for sector, tickers in sectors.items()}
@@ -1,10 +1,23 @@
 # backtest/backtest_engine.py
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
+from analysis.factor_panel import PricePanel
+from backtest.sweep import sweep_panel
+from backtest.walk_forward import FactorHistory, walk_forward
+from utils.price_store import get_price_store, last_session_close
+
+HISTORY_INTERVAL = "1d"
+HISTORY_CACHE_SIZE = 1024  # frames kept in memory across page reruns
+
+# (ticker, interval, last session date, days) -> OHLCV frame, or None for no data
+_HISTORY_CACHE = OrderedDict()
+_HISTORY_LOCK = threading.Lock()
+
 
 class BacktestEngine:
 
@@ -16,16 +29,55 @@ class BacktestEngine:
     # ---------------------------------------------------
     # Load 2 years of price data
     # ---------------------------------------------------
-    def load_history(self, ticker):
+    def load_frames(self, tickers):
+        """
+        OHLCV up to the last completed session for each ticker. Frames are
+        memoized in an LRU keyed by (ticker, interval, last session date);
+        misses are read in one bulk call from the price store, whose files
+        stay current until the next close. A rerun on the same trading day
+        touches neither disk nor network, and a new bar changes the key.
+        """
         period_days = int(self.lookback_years * 365)
+        session = last_session_close().date().isoformat()
+        keys = {t: (t, HISTORY_INTERVAL, session, period_days) for t in dict.fromkeys(tickers)}
+
+        frames, missing = {}, []
+        with _HISTORY_LOCK:
+            for t, key in keys.items():
+                if key in _HISTORY_CACHE:
+                    _HISTORY_CACHE.move_to_end(key)
+                    frames[t] = _HISTORY_CACHE[key]
+                else:
+                    missing.append(t)
+
+        if missing:
+            try:
+                loaded, failed, malformed = get_price_store().fetch_many(missing, period_days, closed_only=True)
+                failed |= malformed
+            except Exception:
+                loaded, failed = {}, set(missing)
+            # a ticker the store answered for is memoized, as None when it has
+            # no data, so a rerun does not ask again before the next session;
+            # a failed or malformed download caches nothing and is retried on the next call
+            with _HISTORY_LOCK:
+                for t in missing:
+                    frames[t] = loaded.get(t)
+                    if t not in failed:
+                        _HISTORY_CACHE[keys[t]] = frames[t]
+                while len(_HISTORY_CACHE) > HISTORY_CACHE_SIZE:
+                    _HISTORY_CACHE.popitem(last=False)
+
+        return {t: df for t, df in frames.items() if df is not None and not df.empty}
+
+    def load_histories(self, tickers):
+        # adjusted closes, so returns are not skewed by splits and dividends
+        return {
+            t: df["Adj Close"] if "Adj Close" in df.columns else df["Close"]
+            for t, df in self.load_frames(tickers).items()
+        }
 
-        try:
-            df = yf.download(ticker, period=f"{period_days}d", interval="1d")
-            if df.empty:
-                return None
-            return df["Close"]
-        except:
-            return None
+    def load_history(self, ticker):
+        return self.load_histories([ticker]).get(ticker)
 
     # ---------------------------------------------------
     # Daily strategy: Buy Top-K and hold for 10 days
@@ -38,11 +90,13 @@ class BacktestEngine:
         all_returns = []
         equity_curve = [1]
 
-        for item in ranked_data[:K]:
+        top = ranked_data[:K]
+        histories = self.load_histories([item["ticker"] for item in top])
+
+        for item in top:
             ticker = item["ticker"]
-            fs = item["final_score"]
 
-            prices = self.load_history(ticker)
+            prices = histories.get(ticker)
             if prices is None or len(prices) < hold_days + 1:
                 continue
 
@@ -73,3 +127,42 @@ class BacktestEngine:
             "sharpe": round(sharpe, 2),
             "equity_curve": equity_curve,
         }
+
+    # ---------------------------------------------------
+    # Historical walk-forward: rebalance into Top-K every hold_days
+    # ---------------------------------------------------
+    def load_panel(self, tickers):
+        frames = self.load_frames(tickers)
+        return PricePanel.from_frames(frames) if frames else None
+
+    def run_walk_forward(self, tickers, K=3, hold_days=10):
+        """
+        Scores every ticker on every date of the lookback window and trades
+        the Top-K (see backtest/walk_forward.py).
+        """
+        panel = self.load_panel(tickers)
+        if panel is None:
+            return None
+
+        history = FactorHistory.from_panel(panel)
+        return walk_forward(
+            history,
+            top_k=K,
+            hold_days=hold_days,
+            tech_weight=self.tech_weight,
+            sent_weight=self.sent_weight,
+        )
+
+    # ---------------------------------------------------
+    # Parameter sweep: one data load, one factor history
+    # ---------------------------------------------------
+    def run_sweep(self, tickers, grid, sectors=None, workers=None):
+        """
+        grid: {parameter: [values]} over top_k, hold_days, tech_weight,
+        sent_weight, top_n_per_sector and the liquidity filters.
+        Returns one row of metrics per configuration.
+        """
+        panel = self.load_panel(tickers)
+        if panel is None:
+            return None
+        return sweep_panel(panel, grid, sectors=sectors, workers=workers)
@@ -0,0 +1,168 @@
+# backtest/sweep.py
+from __future__ import annotations
+
+import itertools
+import os
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.factor_panel import PricePanel
+from analysis.shared_panel import map_shared
+from backtest.walk_forward import HISTORY_FIELDS, FactorHistory, _metrics, _simulate
+
+
+# walk_forward parameters a grid may vary
+SWEEP_PARAMS = [
+    "top_k",
+    "hold_days",
+    "tech_weight",
+    "sent_weight",
+    "top_n_per_sector",
+    "min_history",
+    "min_price",
+    "min_avg_volume",
+]
+SWEEP_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+METRIC_COLUMNS = ["win_rate", "avg_return", "total_return", "max_drawdown", "sharpe", "periods"]
+
+
+class SharedHistory:
+    """
+    A FactorHistory in one shared_memory segment: its (dates, tickers)
+    planes, then the per-ticker name ranks and sector codes. Workers attach
+    through `handle` and rebuild a FactorHistory over views of the segment,
+    as SharedPanel does for OHLCV.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, int, int], owner: bool):
+        self.shm = shm
+        self.shape = shape
+        self.owner = owner
+        planes = int(np.prod(shape))
+        buf = np.ndarray(planes + 2 * shape[2], dtype=np.float64, buffer=shm.buf)
+        self.data = buf[:planes].reshape(shape)
+        self.per_ticker = buf[planes:].reshape(2, shape[2])
+
+    @classmethod
+    def from_history(cls, history: FactorHistory) -> "SharedHistory":
+        shape = (len(HISTORY_FIELDS),) + history.close.shape
+        nbytes = 8 * (int(np.prod(shape)) + 2 * shape[2])
+        shared = cls(shared_memory.SharedMemory(create=True, size=max(nbytes, 1)), shape, owner=True)
+        shared.data[...] = np.stack(history.planes())
+        shared.per_ticker[...] = [history.names, history.sectors]
+        return shared
+
+    @property
+    def handle(self) -> Tuple[str, Tuple[int, int, int]]:
+        return self.shm.name, self.shape
+
+    @classmethod
+    def attach(cls, handle: Tuple[str, Tuple[int, int, int]]) -> "SharedHistory":
+        name, shape = handle
+        return cls(shared_memory.SharedMemory(name=name), shape, owner=False)
+
+    def history(self) -> FactorHistory:
+        planes = dict(zip(HISTORY_FIELDS, self.data))
+        names, sectors = self.per_ticker.astype(int)
+        return FactorHistory([], None, names=names, sectors=sectors, **planes)
+
+    def close(self) -> None:
+        self.data = self.per_ticker = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> "SharedHistory":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        self.unlink()
+
+
+# ----------------------------------------------------------
+# WORKER
+# ----------------------------------------------------------
+def _run_config(handle, config: Dict) -> Dict:
+    """
+    Metrics for one configuration, plus how long it took.
+    """
+    start = time.perf_counter()
+    shared = SharedHistory.attach(handle)
+    try:
+        params = dict(config)
+        sim = _simulate(shared.history(), params.pop("top_k", 3), params.pop("hold_days", 10), None, **params)
+        metrics = _metrics(sim[3], sim[4]) if sim is not None else dict.fromkeys(METRIC_COLUMNS)
+    finally:
+        shared.close()
+    return {**metrics, "seconds": time.perf_counter() - start}
+
+
+# ----------------------------------------------------------
+# SWEEP
+# ----------------------------------------------------------
+def param_grid(grid: Dict[str, List]) -> List[Dict]:
+    """
+    Every combination of a {parameter: [values]} grid, in grid order.
+    """
+    unknown = sorted(set(grid) - set(SWEEP_PARAMS))
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {unknown} (expected some of {SWEEP_PARAMS})")
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def sweep_history(
+    history: FactorHistory,
+    grid: Dict[str, List],
+    workers: Optional[int] = None,
+    progress: bool = True,
+) -> pd.DataFrame:
+    """
+    Runs walk_forward for every configuration of `grid` against one shared
+    FactorHistory, across `workers` processes (inline when 1). Returns one
+    row per configuration: its parameters, the walk_forward metrics and
+    the seconds it took.
+    """
+    configs = param_grid(grid)
+    workers = SWEEP_WORKERS if workers is None else workers
+    started = time.perf_counter()
+
+    def report(i: int, result: Dict) -> None:
+        if progress:
+            print(f"[{i + 1}/{len(configs)}] {configs[i]}: sharpe {result['sharpe']}, "
+                  f"total {result['total_return']}% ({result['seconds']:.2f}s)")
+
+    with SharedHistory.from_history(history) as shared:
+        results = map_shared(shared, _run_config, [(c,) for c in configs], workers, on_result=report)
+
+    if progress:
+        print(f"Sweep: {len(configs)} configurations in {time.perf_counter() - started:.2f}s ({workers} workers)")
+    return pd.DataFrame(
+        [{**c, **r} for c, r in zip(configs, results)],
+        columns=list(grid) + METRIC_COLUMNS + ["seconds"],
+    )
+
+
+def sweep_panel(
+    panel: PricePanel,
+    grid: Dict[str, List],
+    sectors: Optional[Dict[str, str]] = None,
+    workers: Optional[int] = None,
+    progress: bool = True,
+) -> pd.DataFrame:
+    """
+    sweep_history() after computing the factor history once.
+    """
+    started = time.perf_counter()
+    history = FactorHistory.from_panel(panel, sectors)
+    if progress:
+        print(f"Factor history: {len(panel.tickers)} tickers x {len(panel.dates)} days "
+              f"in {time.perf_counter() - started:.2f}s")
+    return sweep_history(history, grid, workers, progress)
@@ -0,0 +1,329 @@
+# backtest/walk_forward.py
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.alpha_factors import rolling_slope
+from analysis.factor_panel import (
+    ATR_PERIOD,
+    MA_WINDOW,
+    MOMENTUM_MIN_ROWS,
+    TREND_MIN_ROWS,
+    TREND_WINDOW,
+    VOLUME_WINDOW,
+    PricePanel,
+)
+
+
+# Eligibility, mirroring the daily job's filters (jobs/build_recommendations.py)
+MIN_HISTORY_ROWS = 120
+MIN_PRICE = 5.0
+MIN_AVG_VOL_20D = 500_000
+
+SENT_SCORE = 70  # the job's sentiment placeholder
+MISSING_ATR_KEY = 9999.0  # rank_key's value for a missing ATR%
+TRADING_DAYS = 252
+
+
+# ----------------------------------------------------------
+# INTERNAL HELPERS
+# ----------------------------------------------------------
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean of each column over `window` rows via cumulative sums.
+    Rows without a full window, or whose window holds a NaN, are NaN.
+    """
+    out = np.full(values.shape, np.nan)
+    if values.shape[0] < window:
+        return out
+    missing = ~np.isfinite(values)
+    pad = np.zeros((1,) + values.shape[1:])
+    c = np.concatenate([pad, np.cumsum(np.where(missing, 0.0, values), axis=0)])
+    c_nan = np.concatenate([pad, np.cumsum(missing, axis=0)])
+    mean = (c[window:] - c[:-window]) / window
+    mean[(c_nan[window:] - c_nan[:-window]) > 0] = np.nan
+    out[window - 1 :] = mean
+    return out
+
+
+def _stack_valid(valid: np.ndarray, *arrays: np.ndarray) -> List[np.ndarray]:
+    """
+    Each column's valid rows moved to the top, oldest first, NaN below: the
+    rows of that ticker's dropna()'d frame, so windows never span a gap.
+    """
+    order = np.argsort(~valid, axis=0, kind="stable")
+    return [np.take_along_axis(np.where(valid, a, np.nan), order, axis=0) for a in arrays]
+
+
+def _unstack_valid(stacked: np.ndarray, valid: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Inverse of _stack_valid: values back on their dates, NaN where a ticker
+    has no bar. `rows` counts each column's valid rows so far.
+    """
+    return np.where(valid, np.take_along_axis(stacked, np.maximum(rows - 1, 0), axis=0), np.nan)
+
+
+def _score(raw: np.ndarray, ok: np.ndarray) -> np.ndarray:
+    """
+    Scales like alpha_factors._clip_int: 0..100, truncated, 50 where undefined.
+    """
+    out = np.full(raw.shape, 50, dtype=int)
+    ok = ok & np.isfinite(raw)
+    out[ok] = np.clip(raw[ok], 0, 100).astype(int)
+    return out
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """
+    Carries each column's last finite value down (held positions keep their
+    last price through gaps and after delisting).
+    """
+    idx = np.where(np.isfinite(values), np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return np.take_along_axis(values, idx, axis=0)
+
+
+# ----------------------------------------------------------
+# FACTOR HISTORY
+# ----------------------------------------------------------
+# (dates, tickers) planes a FactorHistory is made of, in block order
+HISTORY_FIELDS = ["close", "last_close", "rows", "avg_vol", "tech", "atr_key"]
+
+
+class FactorHistory:
+    """
+    Everything a walk-forward run needs for every (date, ticker) of a panel,
+    each shaped (dates, tickers): the forward-filled adjusted close used for
+    holding returns (so splits and dividends are not read as price moves),
+    the day's own raw close, bars seen so far, 20-day average volume, the job's
+    tech score and its ATR% tie-break. Alpha weights and the liquidity
+    filters are applied per run, so one history serves a whole sweep.
+
+    `names` ranks the tickers alphabetically (the last rank_key tie-break);
+    `sectors` holds per-ticker sector codes, -1 where unknown.
+    """
+
+    def __init__(self, tickers, dates, close, last_close, rows, avg_vol, tech, atr_key, names, sectors):
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.close = close
+        self.last_close = last_close
+        self.rows = rows
+        self.avg_vol = avg_vol
+        self.tech = tech
+        self.atr_key = atr_key
+        self.names = names
+        self.sectors = sectors
+
+    @classmethod
+    def from_panel(cls, panel: PricePanel, sectors: Optional[Dict[str, str]] = None) -> "FactorHistory":
+        high = np.asarray(panel.high, dtype=float)
+        low = np.asarray(panel.low, dtype=float)
+        close = np.asarray(panel.close, dtype=float)
+        adj_close = np.asarray(panel.adj_close, dtype=float)
+        volume = np.asarray(panel.volume, dtype=float)
+
+        valid = np.isfinite(high) & np.isfinite(low) & np.isfinite(close) & np.isfinite(volume)
+        rows = np.cumsum(valid, axis=0)  # bars seen so far, per ticker
+        close = np.where(valid, close, np.nan)
+
+        # windows run over each ticker's own bars, as the job's dropna()'d frames do
+        s_high, s_low, s_close, s_volume = _stack_valid(valid, high, low, close, volume)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # MOMENTUM: % above the 50-day moving average
+            ma = _rolling_mean(s_close, MA_WINDOW)
+            ma[ma == 0] = np.nan
+            raw = _unstack_valid((s_close - ma) / ma * 100.0 * 2, valid, rows)
+            momentum = _score(raw, rows >= MOMENTUM_MIN_ROWS)
+
+            # TREND STRENGTH: slope of the 20-day regression relative to the close
+            raw = _unstack_valid(rolling_slope(s_close, TREND_WINDOW) / s_close * 50000, valid, rows)
+            trend = _score(raw, rows >= TREND_MIN_ROWS)
+
+            # ATR% (rank_key tie-break: lower is better)
+            prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), s_close[:-1]])
+            tr = np.fmax(s_high - s_low, np.fmax(np.abs(s_high - prev_close), np.abs(s_low - prev_close)))
+            tr[0] = np.nan
+            atr_pct = np.round(_unstack_valid(_rolling_mean(tr, ATR_PERIOD) / s_close * 100.0, valid, rows), 2)
+            atr_key = np.where(np.isfinite(atr_pct) & (atr_pct != 0), atr_pct, MISSING_ATR_KEY)
+
+            avg_vol = _unstack_valid(_rolling_mean(s_volume, VOLUME_WINDOW), valid, rows)
+
+        names = np.argsort(np.argsort(np.asarray(panel.tickers, dtype=str)))
+        codes = {}
+        sector_codes = np.array(
+            [codes.setdefault(sectors[t], len(codes)) if sectors and sectors.get(t) else -1 for t in panel.tickers],
+            dtype=int,
+        )
+        return cls(
+            panel.tickers, panel.dates, _forward_fill(np.where(valid, adj_close, np.nan)), close, rows, avg_vol,
+            (momentum + trend) // 2, atr_key, names, sector_codes,
+        )
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], sectors: Optional[Dict[str, str]] = None) -> "FactorHistory":
+        return cls.from_panel(PricePanel.from_frames(frames), sectors)
+
+    def planes(self) -> List[np.ndarray]:
+        return [getattr(self, f) for f in HISTORY_FIELDS]
+
+    def alpha(self, tech_weight: float = 0.5, sent_weight: float = 0.5) -> np.ndarray:
+        """
+        int(tech_weight * tech_score + sent_weight * sent_score) per cell;
+        0.5 / 0.5 is the job's composite.
+        """
+        return np.floor(tech_weight * self.tech + sent_weight * SENT_SCORE + 1e-9).astype(int)
+
+    def eligible(
+        self,
+        min_history: int = MIN_HISTORY_ROWS,
+        min_price: float = MIN_PRICE,
+        min_avg_volume: float = MIN_AVG_VOL_20D,
+    ) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            return (
+                np.isfinite(self.last_close)
+                & (self.rows >= min_history)
+                & (self.last_close >= min_price)
+                & (self.avg_vol >= min_avg_volume)
+            )
+
+
+# ----------------------------------------------------------
+# WALK-FORWARD BACKTEST
+# ----------------------------------------------------------
+def _sector_ranks(codes: np.ndarray) -> np.ndarray:
+    """
+    For rows of sector codes, how many earlier cells in the same row share
+    each cell's sector (unknown sectors, -1, count as one group).
+    """
+    keys = np.unique(codes)
+    onehot = codes[..., None] == keys
+    return np.take_along_axis(np.cumsum(onehot, axis=1) - 1, np.searchsorted(keys, codes)[..., None], axis=2)[..., 0]
+
+
+def select_top_k(
+    history: FactorHistory,
+    rebalance: np.ndarray,
+    top_k: int,
+    alpha: np.ndarray,
+    eligible: np.ndarray,
+    top_n_per_sector: Optional[int] = None,
+):
+    """
+    Top-K column indices per rebalance row, in rank_key order (alpha desc,
+    ATR% asc, ticker), at most `top_n_per_sector` from one sector, plus a
+    mask of which picks are actually eligible.
+    """
+    n = len(history.names)
+    ok = eligible[rebalance]
+    score = np.where(ok, alpha[rebalance], -1)
+    names = np.broadcast_to(history.names, score.shape)
+
+    order = np.lexsort((names, history.atr_key[rebalance], -score), axis=-1)
+    ok = np.take_along_axis(ok, order, axis=1)
+    if top_n_per_sector is not None:
+        ok &= _sector_ranks(history.sectors[order]) < top_n_per_sector
+        # capped names drop behind every admissible one, order otherwise kept
+        resort = np.argsort(~ok, axis=1, kind="stable")
+        order = np.take_along_axis(order, resort, axis=1)
+        ok = np.take_along_axis(ok, resort, axis=1)
+
+    k = min(top_k, n)
+    return order[:, :k], ok[:, :k]
+
+
+def _simulate(history: FactorHistory, top_k: int, hold_days: int, start: Optional[int], **params):
+    """
+    The array part of walk_forward: (rebalance rows, picks, picked_ok,
+    equity, period_growth), or None if there is nothing to trade.
+    """
+    alpha = history.alpha(params.pop("tech_weight", 0.5), params.pop("sent_weight", 0.5))
+    top_n_per_sector = params.pop("top_n_per_sector", None)
+    eligible = history.eligible(**params)
+
+    n_dates = history.close.shape[0]
+    if start is None:
+        any_eligible = np.flatnonzero(eligible.any(axis=1))
+        if not len(any_eligible):
+            return None
+        start = int(any_eligible[0])
+    if top_k < 1 or hold_days < 1 or start >= n_dates - 1:
+        return None
+
+    rebalance = np.arange(start, n_dates - 1, hold_days)
+    picks, picked_ok = select_top_k(history, rebalance, top_k, alpha, eligible, top_n_per_sector)
+    weights = picked_ok / np.maximum(picked_ok.sum(axis=1, keepdims=True), 1)
+
+    # growth of each period's basket from its entry close, on every held day
+    days = np.arange(start + 1, n_dates)
+    period = (days - start - 1) // hold_days
+    entry = history.close[rebalance][np.arange(len(rebalance))[:, None], picks]
+    held = history.close[days[:, None], picks[period]] / entry[period]
+    held = np.where(picked_ok[period] & np.isfinite(held), held, 1.0)
+    growth = (held * weights[period]).sum(axis=1) + (1.0 - weights[period].sum(axis=1))
+
+    # compound the completed periods
+    last_day = np.r_[np.flatnonzero(np.diff(period)), len(days) - 1]
+    period_growth = growth[last_day]
+    capital = np.r_[1.0, np.cumprod(period_growth)[:-1]]
+    equity = np.r_[1.0, capital[period] * growth]
+    return rebalance, picks, picked_ok, equity, period_growth
+
+
+def _metrics(equity: np.ndarray, period_growth: np.ndarray) -> Dict:
+    period_returns = period_growth - 1.0
+    daily = np.diff(equity) / equity[:-1]
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0
+    std = daily.std()
+    return {
+        "win_rate": round(float((period_returns > 0).mean()) * 100, 2),
+        "avg_return": round(float(period_returns.mean()) * 100, 2),
+        "total_return": round(float(equity[-1] - 1.0) * 100, 2),
+        "max_drawdown": round(float(drawdown.min()) * 100, 2),
+        "sharpe": round(float(daily.mean() / std * np.sqrt(TRADING_DAYS)), 2) if std > 0 else 0,
+        "periods": int(len(period_growth)),
+    }
+
+
+def walk_forward(
+    history: FactorHistory,
+    top_k: int = 3,
+    hold_days: int = 10,
+    start: Optional[int] = None,
+    **params,
+) -> Optional[Dict]:
+    """
+    Rebalances every `hold_days` bars into the top K names, equal weight,
+    entering and exiting at the close; positions drift within a holding
+    period. Slots with no eligible name sit in cash.
+
+    `start` is the first rebalance row (default: the first date with an
+    eligible ticker). Other keyword parameters: tech_weight, sent_weight,
+    top_n_per_sector and the FactorHistory.eligible() filters. Returns None
+    if there is nothing to trade.
+    """
+    sim = _simulate(history, top_k, hold_days, start, **params)
+    if sim is None:
+        return None
+    rebalance, picks, picked_ok, equity, period_growth = sim
+
+    tickers = np.asarray(history.tickers, dtype=object)
+    holdings = pd.DataFrame(
+        np.where(picked_ok, tickers[picks], None),
+        index=history.dates[rebalance],
+        columns=range(1, picks.shape[1] + 1),
+    )
+    return {
+        **_metrics(equity, period_growth),
+        "equity_curve": pd.Series(equity, index=history.dates[rebalance[0]:], name="equity"),
+        "period_returns": pd.Series(period_growth - 1.0, index=history.dates[rebalance], name="return"),
+        "holdings": holdings,
+    }
+
+
+def backtest_panel(panel: PricePanel, top_k: int = 3, hold_days: int = 10, **params) -> Optional[Dict]:
+    return walk_forward(FactorHistory.from_panel(panel), top_k=top_k, hold_days=hold_days, **params)
@@ -0,0 +1,136 @@
+# benchmarks/fake_postgrest.py
+"""
+Local stand-in for the Supabase PostgREST endpoint, for offline sink tests:
+
+    server = FakePostgREST(latency=0.05).start()
+    sink = SupabaseSink(url=server.url, key=FAKE_KEY)
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+FAKE_KEY = "local.fake.key"
+
+
+class FakePostgREST:
+    """
+    Accepts upserts (POST /rest/v1/<table>, merged on the `on_conflict`
+    columns) and simple reads (GET with eq.<value> filters), with an optional
+    fixed latency per request. Counts requests and payload bytes.
+    """
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.tables: Dict[str, Dict[tuple, Dict]] = {}
+        self.requests = 0
+        self.bytes_in = 0
+        self.max_concurrent = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakePostgREST":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-postgrest", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def rows(self, table: str) -> List[Dict]:
+        with self._lock:
+            return list(self.tables.get(table, {}).values())
+
+    # ---------------------------------------------------------
+    # Request handling
+    # ---------------------------------------------------------
+    def _upsert(self, table: str, rows: List[Dict], keys: List[str]) -> None:
+        with self._lock:
+            store = self.tables.setdefault(table, {})
+            for i, row in enumerate(rows):
+                pk = tuple(row.get(k) for k in keys) if keys else (len(store) + i,)
+                store[pk] = {**store.get(pk, {}), **row}
+
+    def _select(self, table: str, query: Dict[str, List[str]]) -> List[Dict]:
+        filters = {
+            k: v[0][3:] for k, v in query.items() if v and v[0].startswith("eq.")
+        }
+        return [r for r in self.rows(table) if all(str(r.get(k)) == val for k, val in filters.items())]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _begin(self) -> Optional[str]:
+                with fake._lock:
+                    fake.requests += 1
+                    fake._active += 1
+                    fake.max_concurrent = max(fake.max_concurrent, fake._active)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                path = urlparse(self.path).path
+                if not path.startswith("/rest/v1/"):
+                    self.send_error(404)
+                    return None
+                return path[len("/rest/v1/") :]
+
+            def _end(self) -> None:
+                with fake._lock:
+                    fake._active -= 1
+
+            def _reply(self, status: int, body: Optional[List[Dict]] = None) -> None:
+                payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                try:
+                    table = self._begin()
+                    if table is None:
+                        return
+                    length = int(self.headers.get("Content-Length", 0))
+                    raw = self.rfile.read(length)
+                    with fake._lock:
+                        fake.bytes_in += len(raw)
+                    rows = json.loads(raw or b"[]")
+                    rows = rows if isinstance(rows, list) else [rows]
+                    query = parse_qs(urlparse(self.path).query)
+                    keys = [k for k in query.get("on_conflict", [""])[0].split(",") if k]
+                    fake._upsert(table, rows, keys)
+                    if "return=representation" in self.headers.get("Prefer", ""):
+                        self._reply(201, rows)
+                    else:
+                        self._reply(201)
+                finally:
+                    self._end()
+
+            def do_GET(self):
+                try:
+                    table = self._begin()
+                    if table is None:
+                        return
+                    self._reply(200, fake._select(table, parse_qs(urlparse(self.path).query)))
+                finally:
+                    self._end()
+
+        return Handler
@@ -0,0 +1,380 @@
+# benchmarks/run.py
+"""
+Synthetic-market benchmarks, no network:
+
+    python -m benchmarks.run                 # full suite (500 and 3000 ticker jobs)
+    python -m benchmarks.run --quick         # small sizes, for a smoke check
+    python -m benchmarks.run --only panel    # one suite: single, streaming, panel, backtest, sink or job
+
+Results go to cache/benchmarks/<timestamp>.json (or --out).
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime as dt
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.alpha_factors import (
+    FeatureContext,
+    momentum_score,
+    trend_strength,
+    volatility_adjusted,
+    volume_divergence,
+)
+from analysis.atr_engine import ATREngine
+from analysis.factor_panel import PricePanel, compute_factor_panel
+from analysis.price_targets import compute_price_targets_from_df
+from analysis.shared_panel import SharedPanel, score_shared_panel
+from analysis.streaming_factors import FactorStateStore, StreamingFactorState
+from backtest.sweep import param_grid, sweep_history
+from backtest.walk_forward import FactorHistory, walk_forward
+from benchmarks.fake_postgrest import FAKE_KEY, FakePostgREST
+from benchmarks.synthetic import FakeProvider, synthetic_ohlcv, synthetic_tickers
+from jobs.sinks import SQLiteSink, SupabaseSink
+from utils.reco_store import SQLiteRecoStore
+
+
+RESULTS_DIR = Path("cache") / "benchmarks"
+
+DAYS = 300
+SEED = 7
+JOB_SIZES = [500, 3000]
+QUICK_JOB_SIZES = [100]
+SUITES = ["single", "streaming", "panel", "backtest", "sink", "job"]
+SINK_ROWS = 3000
+POSTGREST_LATENCY = 0.02  # per request, roughly a same-region round trip
+BACKTEST_DAYS = 504  # ~2 trading years
+SWEEP_GRID = {"top_k": [3, 5, 10], "hold_days": [5, 10, 20], "tech_weight": [0.5, 0.6], "sent_weight": [0.5, 0.4]}
+JOB_SECTORS = ["Technology", "Healthcare", "Financials", "Industrials", "Energy"]
+
+
+# ----------------------------------------------------------
+# TIMING
+# ----------------------------------------------------------
+def _timeit(fn: Callable[[], object], repeat: int, number: int = 1) -> Dict:
+    """
+    Runs fn `number` times per sample, `repeat` samples; seconds per call.
+    """
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+    }
+
+
+@contextlib.contextmanager
+def _patched(obj, **attrs):
+    saved = {k: getattr(obj, k) for k in attrs}
+    for k, v in attrs.items():
+        setattr(obj, k, v)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(obj, k, v)
+
+
+# ----------------------------------------------------------
+# BENCHMARKS
+# ----------------------------------------------------------
+def bench_single_ticker(quick: bool) -> Dict[str, Dict]:
+    df = synthetic_ohlcv(["ONE"], days=DAYS, seed=SEED)["ONE"]
+    repeat, number = (3, 20) if quick else (7, 100)
+    engine = ATREngine()
+
+    def all_factors():
+        ctx = FeatureContext(df)
+        return momentum_score(ctx), trend_strength(ctx), volume_divergence(ctx), volatility_adjusted(ctx)
+
+    cases = {
+        "factors.momentum_score": lambda: momentum_score(df),
+        "factors.trend_strength": lambda: trend_strength(df),
+        "factors.volume_divergence": lambda: volume_divergence(df),
+        "factors.volatility_adjusted": lambda: volatility_adjusted(df),
+        "factors.all_shared_context": all_factors,
+        "targets.compute_price_targets_from_df": lambda: compute_price_targets_from_df(df),
+        "atr_engine.generate_levels": lambda: engine.generate_levels(df),
+    }
+    return {name: {"tickers": 1, **_timeit(fn, repeat, number)} for name, fn in cases.items()}
+
+
+def bench_streaming_update(quick: bool) -> Dict[str, Dict]:
+    df = synthetic_ohlcv(["ONE"], days=DAYS, seed=SEED)["ONE"]
+    state = StreamingFactorState.from_frame(df.iloc[:-1])
+    last = df.iloc[-1]
+    date = df.index[-1]
+
+    def step():
+        s = StreamingFactorState.from_dict(state.to_dict())
+        s.update(date, last["High"], last["Low"], last["Close"], last["Volume"])
+        return s.factors()
+
+    repeat, number = (3, 100) if quick else (7, 1000)
+    return {
+        "streaming.from_frame": {"tickers": 1, **_timeit(lambda: StreamingFactorState.from_frame(df), repeat, 10)},
+        "streaming.load_update_score": {"tickers": 1, **_timeit(step, repeat, number)},
+    }
+
+
+def bench_panel(sizes: List[int], quick: bool) -> Dict[str, Dict]:
+    out = {}
+    for n in sizes:
+        frames = synthetic_ohlcv(synthetic_tickers(n), days=DAYS, seed=SEED)
+        panel = PricePanel.from_frames(frames)
+        repeat = 3 if quick else 5
+        out[f"panel.from_frames[{n}]"] = {"tickers": n, **_timeit(lambda: PricePanel.from_frames(frames), repeat)}
+        out[f"panel.compute_factor_panel[{n}]"] = {
+            "tickers": n,
+            **_timeit(lambda: compute_factor_panel(panel.high, panel.low, panel.close, panel.volume, panel.open), repeat),
+        }
+        workers = max(2, os.cpu_count() or 1)
+        with SharedPanel.from_panel(panel) as shared:
+            out[f"panel.shared_process_pool[{n}, {workers} workers]"] = {
+                "tickers": n,
+                **_timeit(lambda: score_shared_panel(shared, workers), 1 if quick else 3),
+            }
+    return out
+
+
+def bench_backtest(sizes: List[int], quick: bool) -> Dict[str, Dict]:
+    out = {}
+    for n in sizes:
+        frames = synthetic_ohlcv(synthetic_tickers(n), days=BACKTEST_DAYS, seed=SEED)
+        panel = PricePanel.from_frames(frames)
+        history = FactorHistory.from_panel(panel)
+        repeat = 3 if quick else 5
+        out[f"backtest.factor_history[{n}]"] = {"tickers": n, **_timeit(lambda: FactorHistory.from_panel(panel), repeat)}
+        out[f"backtest.walk_forward[{n}]"] = {
+            "tickers": n,
+            **_timeit(lambda: walk_forward(history, top_k=10, hold_days=10), repeat),
+        }
+        configs = len(param_grid(SWEEP_GRID))
+        workers = max(2, os.cpu_count() or 1)
+        out[f"backtest.sweep[{n}, {configs} configs, {workers} workers]"] = {
+            "tickers": n,
+            **_timeit(lambda: sweep_history(history, SWEEP_GRID, workers, progress=False), 1 if quick else 3),
+        }
+    return out
+
+
+def _sample_rows(n: int) -> List[Dict]:
+    factors = {
+        "momentum": 61, "trend_strength": 72, "volume": 48, "vol_adj": 80, "atr_percent": 1.87,
+        "tech_score": 66, "sent_score": 70, "alpha_score": 68,
+        "last_price": np.float64(123.456789), "avg_vol_20d": np.float64(1234567.891),
+    }
+    targets = {"buy_low": 120.1, "buy_high": 124.0, "tp1": 130.5, "tp2": 135.2, "sl": 118.3, "rr": 1.14}
+    return [
+        {
+            "as_of_date": "2026-01-02",
+            "sector": f"S{i // 100}",
+            "rank": i % 100 + 1,
+            "ticker": f"T{i}",
+            "alpha_score": 68,
+            "factors": dict(factors),
+            "targets": dict(targets),
+        }
+        for i in range(n)
+    ]
+
+
+def bench_sink(quick: bool) -> Dict[str, Dict]:
+    """
+    SupabaseSink against the local PostgREST stand-in: sequential batches
+    (the old behaviour) vs several batches in flight; then the SQLite sink.
+    """
+    n = 400 if quick else SINK_ROWS
+    rows = _sample_rows(n)
+    out = {}
+    for in_flight in (1, 4, 8):
+        server = FakePostgREST(latency=POSTGREST_LATENCY).start()
+        sink = SupabaseSink(url=server.url, key=FAKE_KEY, batch_size=200, max_in_flight=in_flight)
+        try:
+            start = time.perf_counter()
+            for i in range(0, n, 100):
+                sink.submit(rows[i : i + 100])
+            sink.close()
+            wall = time.perf_counter() - start
+            out[f"sink.upsert[{n} rows, {in_flight} in flight]"] = {
+                "rows": n,
+                "wall": wall,
+                "rows_per_second": n / wall,
+                "requests": server.requests,
+                "bytes": server.bytes_in,
+                "max_concurrent": server.max_concurrent,
+            }
+        finally:
+            server.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = SQLiteSink(SQLiteRecoStore(Path(tmp) / "recos.sqlite"))
+        start = time.perf_counter()
+        for i in range(0, n, 100):
+            sink.submit(rows[i : i + 100])
+        wall = time.perf_counter() - start
+        sink.store.close()
+    out[f"sink.sqlite_upsert[{n} rows]"] = {"rows": n, "wall": wall, "rows_per_second": n / wall}
+    return out
+
+
+def _run_job(job, provider: FakeProvider, root: Path) -> Dict:
+    start = time.perf_counter()
+    cpu = time.process_time()
+    with provider.installed(), contextlib.redirect_stdout(io.StringIO()):
+        job.main([])
+    return {"wall": time.perf_counter() - start, "cpu": time.process_time() - cpu}
+
+
+def bench_job(sizes: List[int], latency: float) -> Dict[str, Dict]:
+    """
+    Full jobs/build_recommendations.main() over a synthetic universe: a cold
+    run (empty local stores) and a warm rerun the same day.
+    """
+    import jobs.build_recommendations as job
+    from jobs.fingerprints import FingerprintStore
+    from utils.price_store import PriceStore
+
+    out = {}
+    for n in sizes:
+        tickers = synthetic_tickers(n)
+        provider = FakeProvider(synthetic_ohlcv(tickers, days=DAYS, seed=SEED), latency=latency)
+        per_sector = -(-n // len(JOB_SECTORS))
+        mapping = {s: tickers[i * per_sector : (i + 1) * per_sector] for i, s in enumerate(JOB_SECTORS)}
+
+        server = FakePostgREST().start()
+        sink = SupabaseSink(url=server.url, key=FAKE_KEY)
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            store = PriceStore(root=root / "prices", limiter=job.DOWNLOAD_LIMITER, caller=job.DOWNLOAD_CALLER)
+            with _patched(
+                job,
+                SECTORS=JOB_SECTORS,
+                sector_to_tickers=lambda *a, **k: mapping,
+                # no universe refresh and no consumer snapshot or sector map writes
+                pending_universe_diff=lambda consumer: None,
+                mark_universe_diff_applied=lambda consumer, diff: None,
+                UPSERT_SINK=sink,
+                PRICE_STORE=store,
+                STATE_STORE=FactorStateStore(root / "state"),
+                FINGERPRINTS=FingerprintStore(root / "fingerprints.json"),
+                CHECKPOINT_RUNS=False,
+                WRITE_METRICS_REPORT=False,
+            ):
+                cold = _run_job(job, provider, root)
+                cold_requests = provider.requests
+                # a fresh fingerprint store instance re-reads the file, as a new process would
+                job.FINGERPRINTS = FingerprintStore(root / "fingerprints.json")
+                warm = _run_job(job, provider, root)
+                report = job.METRICS.report()
+        sink.close()
+        server.stop()
+
+        out[f"job.cold[{n}]"] = {
+            "tickers": n,
+            **cold,
+            "tickers_per_second": n / cold["wall"],
+            "provider_requests": cold_requests,
+        }
+        out[f"job.warm_rerun[{n}]"] = {
+            "tickers": n,
+            **warm,
+            "tickers_per_second": n / warm["wall"],
+            "provider_requests": provider.requests - cold_requests,
+            "stages": report["stages"],
+        }
+    return out
+
+
+# ----------------------------------------------------------
+# ENTRY POINT
+# ----------------------------------------------------------
+def _environment() -> Dict:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=False
+        ).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "git_rev": rev or None,
+    }
+
+
+def run(quick: bool = False, only: Optional[str] = None, latency: float = 0.0) -> Dict:
+    sizes = QUICK_JOB_SIZES if quick else JOB_SIZES
+    suites = [
+        ("single", lambda: bench_single_ticker(quick)),
+        ("streaming", lambda: bench_streaming_update(quick)),
+        ("panel", lambda: bench_panel(sizes, quick)),
+        ("backtest", lambda: bench_backtest(sizes, quick)),
+        ("sink", lambda: bench_sink(quick)),
+        ("job", lambda: bench_job(sizes, latency)),
+    ]
+
+    results: Dict[str, Dict] = {}
+    for suite, fn in suites:
+        if only and suite != only:
+            continue
+        for name, res in fn().items():
+            results[name] = {k: round(v, 6) if isinstance(v, float) else v for k, v in res.items()}
+            print(f"{name:45s} {results[name].get('median', results[name].get('wall')):.6f}s")
+
+    return {
+        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "quick": quick,
+        "provider_latency": latency,
+        "days": DAYS,
+        "seed": SEED,
+        "environment": _environment(),
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="AlphaBeacon synthetic-market benchmarks")
+    parser.add_argument("--quick", action="store_true", help="small sizes and fewer repeats")
+    parser.add_argument("--only", choices=SUITES, help="run a single suite")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake provider latency per request (s)")
+    parser.add_argument("--out", help="results file (default cache/benchmarks/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(quick=args.quick, only=args.only, latency=args.latency)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{dt.datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/synthetic.py
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from utils.price_store import last_session_close
+
+
+# ----------------------------------------------------------
+# SYNTHETIC MARKET
+# ----------------------------------------------------------
+def synthetic_tickers(n: int, prefix: str = "SYN") -> List[str]:
+    return [f"{prefix}{i:05d}" for i in range(n)]
+
+
+def synthetic_ohlcv(
+    tickers: List[str],
+    days: int = 300,
+    seed: int = 0,
+    end: Optional[pd.Timestamp] = None,
+    start_price: float = 100.0,
+    daily_vol: float = 0.02,
+    volume_mu: float = 14.0,
+    volume_sigma: float = 0.5,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Seeded random-walk OHLCV frames on business days ending at `end`
+    (default: the last completed NY session, so the price store treats
+    them as up to date). Closes are a geometric random walk, volume is
+    lognormal, and highs/lows bracket open and close.
+    """
+    rng = np.random.default_rng(seed)
+    if end is None:
+        end = pd.Timestamp(last_session_close().date())
+    index = pd.bdate_range(end=end, periods=days)
+
+    n = len(tickers)
+    shape = (days, n)
+    close = start_price * rng.uniform(0.2, 5.0, n) * np.exp(np.cumsum(rng.normal(0, daily_vol, shape), axis=0))
+    open_ = close * (1 + rng.normal(0, daily_vol / 4, shape))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, daily_vol, shape))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, daily_vol, shape))
+    volume = np.round(rng.lognormal(volume_mu, volume_sigma, shape))
+
+    frames = {}
+    for j, t in enumerate(tickers):
+        frames[t] = pd.DataFrame(
+            {
+                "Open": open_[:, j],
+                "High": high[:, j],
+                "Low": low[:, j],
+                "Close": close[:, j],
+                "Adj Close": close[:, j],
+                "Volume": volume[:, j],
+            },
+            index=index,
+        )
+    return frames
+
+
+# ----------------------------------------------------------
+# FAKE PROVIDER
+# ----------------------------------------------------------
+class FakeProvider:
+    """
+    In-process stand-in for yf.download over a dict of synthetic frames.
+    Answers in the same layout as group_by="ticker" (symbol on column
+    level 0), with an optional fixed latency per request.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], latency: float = 0.0):
+        self.frames = frames
+        self.latency = latency
+        self.requests = 0
+        self.tickers_served = 0
+        self._lock = threading.Lock()
+
+    def download(self, tickers, start=None, end=None, **kwargs) -> pd.DataFrame:
+        names = [tickers] if isinstance(tickers, str) else list(tickers)
+        if self.latency:
+            time.sleep(self.latency)
+
+        parts = {}
+        for t in names:
+            df = self.frames.get(t)
+            if df is None:
+                continue
+            if start is not None:
+                df = df[df.index >= pd.Timestamp(start)]
+            if end is not None:
+                df = df[df.index < pd.Timestamp(end)]
+            parts[t] = df
+
+        with self._lock:
+            self.requests += 1
+            self.tickers_served += len(parts)
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, axis=1)
+
+    @contextmanager
+    def installed(self):
+        """
+        Replaces yfinance.download for the duration of the block.
+        """
+        original = yf.download
+        yf.download = self.download
+        try:
+            yield self
+        finally:
+            yf.download = original
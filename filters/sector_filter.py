@@ -3,49 +3,186 @@
 import yfinance as yf
 import pickle
 import os
+import heapq
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis.ranking import rank_key
+# Seed source for sectors: the universe file's GICS Sector column
+from analysis.universe import load_sp500_universe
+
+LOOKUP_WORKERS = 8  # concurrent yf.Ticker(...).info calls for unknown tickers
+
+# Yahoo's sector names -> the GICS names used by the universe file, so the
+# map holds one taxonomy whichever source resolved a ticker
+YAHOO_TO_GICS = {
+    "Technology": "Information Technology",
+    "Healthcare": "Health Care",
+    "Financial Services": "Financials",
+    "Consumer Cyclical": "Consumer Discretionary",
+    "Consumer Defensive": "Consumer Staples",
+    "Basic Materials": "Materials",
+    "Communication Services": "Communication Services",
+    "Energy": "Energy",
+    "Industrials": "Industrials",
+    "Real Estate": "Real Estate",
+    "Utilities": "Utilities",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sector_map (
+    ticker TEXT PRIMARY KEY,
+    sector TEXT NOT NULL,
+    source TEXT NOT NULL
+)
+"""
+
+
+def _to_gics(sector):
+    return YAHOO_TO_GICS.get(sector, sector)
+
+
+def _lookup_sector(ticker):
+    try:
+        return ticker, _to_gics(yf.Ticker(ticker).info.get("sector") or "Unknown"), True
+    except Exception:
+        return ticker, "Unknown", False
+
 
 class SectorFilter:
+    """
+    Ticker -> sector map stored in SQLite (one row per ticker), so a lookup
+    reads one key instead of the whole map. Each batch of newly resolved
+    sectors is committed in a single transaction.
+    """
 
-    CACHE_FILE = "cache/sector_map.pkl"
+    CACHE_FILE = "cache/sector_map.sqlite"
+    LEGACY_FILE = "cache/sector_map.pkl"
 
     def __init__(self, max_per_sector=3):
         self.max_per_sector = max_per_sector
+        self.sector_map = {}  # in-process memo of keys already read
 
-        # Load sector cache if exists
-        if os.path.exists(self.CACHE_FILE):
-            with open(self.CACHE_FILE, "rb") as f:
-                self.sector_map = pickle.load(f)
-        else:
-            self.sector_map = {}
+        os.makedirs(os.path.dirname(self.CACHE_FILE), exist_ok=True)
+        self._conn = sqlite3.connect(self.CACHE_FILE, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._lock = threading.Lock()
+        self._migrate_pickle()
+        self._normalize_sectors()
 
     # ---------------------------------------------------------
-    # Fetch sector for each ticker
+    # Storage
     # ---------------------------------------------------------
-    def get_sector(self, ticker):
-        if ticker in self.sector_map:
-            return self.sector_map[ticker]
-
+    def _migrate_pickle(self):
+        if not os.path.exists(self.LEGACY_FILE):
+            return
         try:
-            info = yf.Ticker(ticker).info
-            sector = info.get("sector", "Unknown")
-        except:
-            sector = "Unknown"
-
-        self.sector_map[ticker] = sector
+            with open(self.LEGACY_FILE, "rb") as f:
+                legacy = pickle.load(f)
+        except Exception:
+            return  # keep the pickle, so a later run can still import it
+        # INSERT OR IGNORE: rows already in SQLite win over the old pickle
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sector_map (ticker, sector, source) VALUES (?, ?, 'pickle')",
+                [(t, _to_gics(s)) for t, s in legacy.items() if s],
+            )
+        os.remove(self.LEGACY_FILE)
+
+    def _normalize_sectors(self):
+        # rows stored under Yahoo names before they were mapped to GICS
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE sector_map SET sector = ? WHERE sector = ?",
+                [(gics, yahoo) for yahoo, gics in YAHOO_TO_GICS.items() if gics != yahoo],
+            )
+
+    def _read(self, tickers):
+        found = {}
+        tickers = list(tickers)
+        with self._lock:
+            for i in range(0, len(tickers), 500):
+                chunk = tickers[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT ticker, sector FROM sector_map WHERE ticker IN ({marks})", chunk
+                ).fetchall())
+        return found
+
+    def _write(self, rows):
+        """
+        Persists [(ticker, sector, source)] in one transaction.
+        """
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sector_map (ticker, sector, source) VALUES (?, ?, ?)", rows
+            )
 
-        with open(self.CACHE_FILE, "wb") as f:
-            pickle.dump(self.sector_map, f)
+    # ---------------------------------------------------------
+    # Fetch sector for each ticker
+    # ---------------------------------------------------------
+    def get_sector(self, ticker):
+        return self.build_sector_map([ticker])[ticker]
 
-        return sector
+    # ---------------------------------------------------------
+    # Drop cached sectors (symbols removed or re-classified)
+    # ---------------------------------------------------------
+    def evict(self, tickers):
+        tickers = list(tickers)
+        for t in tickers:
+            self.sector_map.pop(t, None)
+        removed = 0
+        with self._lock, self._conn:
+            for i in range(0, len(tickers), 500):
+                chunk = tickers[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                removed += self._conn.execute(
+                    f"DELETE FROM sector_map WHERE ticker IN ({marks})", chunk
+                ).rowcount
+        return removed
 
     # ---------------------------------------------------------
     # Build sector dictionary for all tickers
     # ---------------------------------------------------------
     def build_sector_map(self, tickers):
-        mapping = {}
-        for t in tickers:
-            mapping[t] = self.get_sector(t)
-        return mapping
+        """
+        Resolves sectors in three passes: the SQLite cache, the universe
+        file's GICS Sector column, then concurrent yfinance lookups for
+        whatever is still unknown. New entries are written once, at the end.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        missing = [t for t in tickers if t not in self.sector_map]
+        if missing:
+            self.sector_map.update(self._read(missing))
+            missing = [t for t in missing if t not in self.sector_map]
+
+        rows = []
+        if missing:
+            try:
+                # rows without a sector would otherwise be stored as the string "nan"
+                universe = load_sp500_universe().dropna(subset=["Symbol", "GICS Sector"])
+                seeds = dict(zip(universe["Symbol"].astype(str), universe["GICS Sector"].astype(str)))
+            except Exception:
+                seeds = {}
+            for t in missing:
+                if seeds.get(t):
+                    self.sector_map[t] = seeds[t]
+                    rows.append((t, seeds[t], "universe"))
+            missing = [t for t in missing if t not in self.sector_map]
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(LOOKUP_WORKERS, len(missing))) as pool:
+                for t, sector, ok in pool.map(_lookup_sector, missing):
+                    self.sector_map[t] = sector
+                    # Failed lookups stay in memory only, so the next run retries them
+                    if ok:
+                        rows.append((t, sector, "yfinance"))
+
+        self._write(rows)
+        return {t: self.sector_map[t] for t in tickers}
 
     # ---------------------------------------------------------
     # Apply max-per-sector diversification rule
@@ -65,6 +202,47 @@ class SectorFilter:
 
         return filtered
 
+    # ---------------------------------------------------------
+    # Same rule over per-sector streams that are already sorted
+    # ---------------------------------------------------------
+    def merge_sector_streams(self, streams, portfolio_size, key=rank_key):
+        """
+        Lazily k-way merges best-first streams ({sector: iterable} or
+        (sector, iterable) pairs; a sector may have several streams), taking at
+        most max_per_sector per sector and stopping at portfolio_size. A
+        stream is never read again once its sector is full, and a ticker
+        seen in several streams counts once.
+        """
+        pairs = streams.items() if isinstance(streams, dict) else streams
+        heap = []
+        for idx, (sector, stream) in enumerate(pairs):
+            it = iter(stream)
+            first = next(it, None)
+            if first is not None:
+                heap.append((key(first), idx, first, sector, it))
+        heapq.heapify(heap)
+
+        sector_count = {}
+        seen = set()
+        picked = []
+        while heap and len(picked) < portfolio_size:
+            _, idx, item, sector, it = heap[0]
+            if sector_count.get(sector, 0) >= self.max_per_sector:
+                heapq.heappop(heap)
+                continue
+            if item["ticker"] not in seen:
+                seen.add(item["ticker"])
+                picked.append(dict(item, sector=sector))
+                sector_count[sector] = sector_count.get(sector, 0) + 1
+
+            nxt = next(it, None)
+            if nxt is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (key(nxt), idx, nxt, sector, it))
+
+        return picked
+
     # ---------------------------------------------------------
     # Get count summary
     # ---------------------------------------------------------
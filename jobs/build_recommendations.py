@@ -1,32 +1,164 @@
 from __future__ import annotations
 
-import os
+import argparse
+import logging
+import subprocess
+import sys
 import datetime as dt
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-import yfinance as yf
-from supabase import create_client
 
 # Your existing modules
-from analysis.alpha_factors import momentum_score, trend_strength, volume_divergence, volatility_adjusted, compute_atr
-from analysis.price_targets import compute_price_targets_from_df
-from analysis.universe import sector_to_tickers
+from analysis.alpha_factors import (
+    FeatureContext,
+    momentum_score,
+    trend_strength,
+    volume_divergence,
+    volatility_adjusted,
+)
+from analysis.factor_panel import PricePanel, compute_factor_panel
+from analysis.price_targets import compute_price_targets_from_df, price_targets_from_levels
+from analysis.streaming_factors import FactorStateStore, StreamingFactorState, advance_state
+from analysis.universe import mark_universe_diff_applied, pending_universe_diff, sector_to_tickers
+from filters.sector_filter import SectorFilter
+from jobs.checkpoint import RunCheckpoint
+from jobs.fingerprints import FingerprintStore, frame_fingerprint, params_hash
+from jobs.metrics import (
+    BELOW_MIN_HISTORY,
+    DOWNLOAD_ERROR,
+    EMPTY_FRAME,
+    LIQUIDITY_FILTER,
+    MISSING_COLUMN,
+    NO_TARGETS,
+    JobMetrics,
+)
+from jobs.pipeline import REPLAYABLE, SectorPipeline
+from jobs.sharding import merge_candidates, shard_label, shard_of, shard_universe, write_candidates
+from jobs.sinks import FanoutSink, SQLiteSink, SupabaseSink
+from jobs.topn import TopNSelector
+from utils.adaptive_limiter import AdaptiveLimiter
+from utils.hedged_fetch import HedgedCaller
+from utils.price_store import PriceStore
+from utils.reco_store import get_sqlite_store, recos_backend
 
 
 SECTORS = ["Technology", "Healthcare", "Financials", "Industrials", "Energy"]
+GICS_SECTORS = [
+    "Communication Services",
+    "Consumer Discretionary",
+    "Consumer Staples",
+    "Energy",
+    "Financials",
+    "Health Care",
+    "Industrials",
+    "Information Technology",
+    "Materials",
+    "Real Estate",
+    "Utilities",
+]
 LOOKBACK_DAYS = 260  # ~1 trading year
 MAX_TICKERS_PER_SECTOR_SCAN = None  # None = scan ALL tickers in that sector
 TOP_N_PER_SECTOR = 10
-MAX_WORKERS = 8  # keep moderate to avoid throttling
+MAX_WORKERS = 8  # starting download concurrency; adapted at runtime
+MIN_WORKERS = 1
+MAX_WORKERS_CAP = 32
 MIN_HISTORY_ROWS = 120
 
+# Downloads run under an AIMD limiter: +1 per healthy round, halved on
+# errors / timeouts / empty frames, so we go as fast as the provider allows.
+DOWNLOAD_LIMITER = AdaptiveLimiter(initial=MAX_WORKERS, min_limit=MIN_WORKERS, max_limit=MAX_WORKERS_CAP)
+# Each request gets a deadline, jittered retries and a hedge past the observed p95
+REQUEST_DEADLINE = 30.0
+REQUEST_ATTEMPTS = 3
+HEDGE_REQUESTS = True
+DOWNLOAD_CALLER = HedgedCaller(deadline=REQUEST_DEADLINE, attempts=REQUEST_ATTEMPTS, hedge=HEDGE_REQUESTS)
+
+PRICE_STORE = PriceStore(limiter=DOWNLOAD_LIMITER, caller=DOWNLOAD_CALLER)
+# ticker -> why this run's download left it without a frame (failed request,
+# rows without OHLCV columns); tickers missing from it simply had no data
+DOWNLOAD_PROBLEMS: Dict[str, str] = {}
+
+# Global pipeline: download and scoring stages run over the whole universe
+PIPELINE_BATCH_SIZE = 50  # tickers handed to one download worker at a time
+DOWNLOAD_STAGE_WORKERS = MAX_WORKERS_CAP  # the limiter decides how many requests are in flight
+SCORE_STAGE_WORKERS = 4
+
+# Scoring mode: "pipeline" (streamed per ticker) or "panel" (whole universe
+# scored as one vectorized panel, inline: at S&P 500 size a process pool
+# costs more in start-up and transfer than it saves)
+SCORE_MODE = "pipeline"
+
+# Incremental factor state: apply only new bars, full rebuild every N bars
+STREAMING_STATE = True
+STATE_REBUILD_EVERY = 20
+STATE_STORE = FactorStateStore()
+
+# One long-lived Supabase client; sectors are upserted as soon as they are
+# ranked, with a few compacted batches in flight at once
+UPSERT_BATCH_SIZE = 200
+UPSERT_IN_FLIGHT = 4
+
+
+def _make_sink():
+    # ALPHABEACON_RECOS_BACKEND: supabase (default), sqlite (offline) or both
+    backend = recos_backend()
+    if backend == "sqlite":
+        return SQLiteSink(get_sqlite_store())
+    supabase = SupabaseSink(batch_size=UPSERT_BATCH_SIZE, max_in_flight=UPSERT_IN_FLIGHT)
+    if backend == "both":
+        return FanoutSink([supabase, SQLiteSink(get_sqlite_store())])
+    return supabase
+
+
+UPSERT_SINK = _make_sink()
+
+# Checkpoint each run under cache/runs/<as_of>/ so a same-day rerun resumes
+CHECKPOINT_RUNS = True
+
 # Basic tradability filters
 MIN_PRICE = 5.0
 MIN_AVG_VOL_20D = 500_000
 
+# Composite score: alpha = TECH_WEIGHT * tech + SENT_WEIGHT * sentiment
+TECH_WEIGHT = 0.5
+SENT_WEIGHT = 0.5
+SENT_SCORE = 70  # placeholder until you wire real sentiment
+
+# Bump whenever factor, target or composite-score code changes, so results
+# fingerprinted by an older version are recomputed
+SCORING_VERSION = 1
+
+# Per-run stage timings, latency histograms and failure taxonomy (JSON report)
+METRICS = JobMetrics()
+WRITE_METRICS_REPORT = True
+
+# Skip unchanged tickers: reuse last result when the newest bar and params match
+REUSE_UNCHANGED = True
+FINGERPRINTS = FingerprintStore()
+
+
+def _params_hash(score_mode: str) -> str:
+    # everything besides the bars that decides a ticker's result
+    return params_hash(
+        {
+            "scoring_version": SCORING_VERSION,
+            "score_mode": score_mode,
+            "lookback_days": LOOKBACK_DAYS,
+            "min_history_rows": MIN_HISTORY_ROWS,
+            "min_price": MIN_PRICE,
+            "min_avg_vol_20d": MIN_AVG_VOL_20D,
+            "tech_weight": TECH_WEIGHT,
+            "sent_weight": SENT_WEIGHT,
+            "sent_score": SENT_SCORE,
+            "streaming_state": STREAMING_STATE,
+        }
+    )
+
+
+PARAMS_HASH = _params_hash(SCORE_MODE)  # main() recomputes it for --score-mode
+
 
 def _safe_last_float(x) -> Optional[float]:
     try:
@@ -42,33 +174,50 @@ def _safe_last_float(x) -> Optional[float]:
         return None
 
 
-def compute_alpha_score_from_df(df: pd.DataFrame) -> Optional[Dict]:
-    """
-    Returns dict with factors + alpha_score, or None if insufficient data.
-    """
-    if df is None or len(df) < MIN_HISTORY_ROWS:
-        return None
-
-    close_last = _safe_last_float(df["Close"].iloc[-1])
+def _filter_reason(rows: int, close_last: Optional[float], vol20: Optional[float]) -> Optional[str]:
+    if rows < MIN_HISTORY_ROWS:
+        return BELOW_MIN_HISTORY
     if close_last is None:
-        return None
-
+        return EMPTY_FRAME
     # Liquidity filter using 20d avg volume
-    vol20 = df["Volume"].tail(20).mean()
-    vol20 = _safe_last_float(vol20)
     if close_last < MIN_PRICE:
-        return None
+        return LIQUIDITY_FILTER
     if vol20 is None or vol20 < MIN_AVG_VOL_20D:
-        return None
+        return LIQUIDITY_FILTER
+    return None
+
+
+def _passes_filters(rows: int, close_last: Optional[float], vol20: Optional[float]) -> bool:
+    return _filter_reason(rows, close_last, vol20) is None
+
+
+def _no_frame_reason(ticker: str) -> str:
+    return DOWNLOAD_PROBLEMS.get(ticker, EMPTY_FRAME)
+
+
+def _frame_problem(ticker: str, df: Optional[pd.DataFrame]) -> Optional[str]:
+    # frames without the OHLCV columns never leave the store; it reports them instead
+    if df is None or df.empty:
+        return _no_frame_reason(ticker)
+    if len(df) < MIN_HISTORY_ROWS:
+        return BELOW_MIN_HISTORY
+    return None
 
-    # Factors (0-100)
-    mom = int(momentum_score(df))
-    trn = int(trend_strength(df))
-    vol = int(volume_divergence(df))
-    vadj = int(volatility_adjusted(df))
 
+def _factor_failure(source) -> str:
+    """
+    Why compute_alpha_score_from_state/_df returned None for this source.
+    """
+    if isinstance(source, StreamingFactorState):
+        f = source.factors()
+        rows, close_last, vol20 = source.count, f["last_price"], f["avg_vol_20d"]
+    else:
+        rows, close_last, vol20 = len(source), source.close.iloc[-1], source.volume.tail(20).mean()
+    return _filter_reason(rows, _safe_last_float(close_last), _safe_last_float(vol20)) or LIQUIDITY_FILTER
+
+
+def _compose_factors(mom: int, trn: int, vol: int, vadj: int, atr, close_last: float, vol20: float) -> Dict:
     # ATR%
-    atr = compute_atr(df).iloc[-1]
     atr = _safe_last_float(atr)
     atr_pct = None
     if atr is not None and close_last is not None and close_last != 0:
@@ -76,8 +225,8 @@ def compute_alpha_score_from_df(df: pd.DataFrame) -> Optional[Dict]:
 
     # Simple composite score (you can evolve this)
     tech_score = int((mom + trn) / 2)
-    sent_score = 70  # placeholder until you wire real sentiment
-    alpha_score = int((tech_score + sent_score) / 2)
+    sent_score = SENT_SCORE
+    alpha_score = int(TECH_WEIGHT * tech_score + SENT_WEIGHT * sent_score)
 
     return {
         "momentum": mom,
@@ -93,110 +242,429 @@ def compute_alpha_score_from_df(df: pd.DataFrame) -> Optional[Dict]:
     }
 
 
-def _download_history(ticker: str) -> Optional[pd.DataFrame]:
-    try:
-        df = yf.download(ticker, period=f"{LOOKBACK_DAYS}d", progress=False, auto_adjust=False)
-        if df is None or df.empty:
-            return None
-        # Standardize columns capitalization, just in case
-        for col in ["Open", "High", "Low", "Close", "Volume"]:
-            if col not in df.columns:
-                return None
-        return df.dropna()
-    except Exception:
+def compute_alpha_score_from_df(df: pd.DataFrame | FeatureContext) -> Optional[Dict]:
+    """
+    Returns dict with factors + alpha_score, or None if insufficient data.
+    Accepts a raw OHLCV frame or a FeatureContext built from one.
+    """
+    if df is None or len(df) < MIN_HISTORY_ROWS:
+        return None
+
+    ctx = FeatureContext.of(df)
+    close_last = _safe_last_float(ctx.close.iloc[-1])
+    vol20 = _safe_last_float(ctx.volume.tail(20).mean())
+    if not _passes_filters(len(ctx), close_last, vol20):
         return None
 
+    # Factors (0-100)
+    return _compose_factors(
+        int(momentum_score(ctx)),
+        int(trend_strength(ctx)),
+        int(volume_divergence(ctx)),
+        int(volatility_adjusted(ctx)),
+        ctx.atr().iloc[-1],
+        close_last,
+        vol20,
+    )
+
 
-def score_ticker(ticker: str) -> Optional[Dict]:
-    df = _download_history(ticker)
-    if df is None:
+def compute_alpha_score_from_state(state: StreamingFactorState) -> Optional[Dict]:
+    """
+    Same output as compute_alpha_score_from_df, read from an incremental state.
+    """
+    f = state.factors()
+    close_last = _safe_last_float(f["last_price"])
+    vol20 = _safe_last_float(f["avg_vol_20d"])
+    if not _passes_filters(state.count, close_last, vol20):
         return None
 
-    factors = compute_alpha_score_from_df(df)
-    if factors is None:
+    return _compose_factors(
+        f["momentum"], f["trend_strength"], f["volume"], f["vol_adj"], f["atr"], close_last, vol20
+    )
+
+
+def download_histories(tickers: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Reads OHLCV history for many tickers through the local price store,
+    which only downloads the bars it does not already have (in multi-ticker
+    batches, with a per-ticker fallback). Tickers left without a frame by a
+    failed or malformed download are noted in DOWNLOAD_PROBLEMS.
+    """
+    frames, failed, malformed = PRICE_STORE.fetch_many(tickers, LOOKBACK_DAYS)
+    for t in frames:
+        DOWNLOAD_PROBLEMS.pop(t, None)
+    DOWNLOAD_PROBLEMS.update({t: MISSING_COLUMN for t in malformed})
+    DOWNLOAD_PROBLEMS.update({t: DOWNLOAD_ERROR for t in failed if t not in frames})
+    return frames
+
+
+def _score_factors(ticker: str, df: Optional[pd.DataFrame]) -> Optional[Tuple[Dict, object]]:
+    """
+    Factor phase of scoring: returns (item without targets, source), where
+    source is the incremental state or the frame's FeatureContext.
+    A ticker whose last bar is unchanged gets its previous result back,
+    with its targets when they were computed. Every None is recorded in
+    METRICS with its failure reason.
+    """
+    problem = _frame_problem(ticker, df)
+    if problem is not None:
+        METRICS.fail(problem, ticker)
         return None
 
-    targets = compute_price_targets_from_df(df)
+    fp = None
+    if REUSE_UNCHANGED:
+        fp = frame_fingerprint(df, PARAMS_HASH)
+        hit = FINGERPRINTS.lookup(ticker, fp)
+        if hit is not None:
+            if hit["item"] is None:
+                METRICS.fail(hit.get("reason") or LIQUIDITY_FILTER, ticker)
+                return None
+            item = dict(hit["item"])
+            if "targets" in hit:
+                item["targets"] = hit["targets"]
+            return item, FeatureContext(df)
+
+    if STREAMING_STATE:
+        # apply only the new bars to yesterday's state (full rebuild on gaps / periodically)
+        source = advance_state(STATE_STORE, ticker, df, rebuild_every=STATE_REBUILD_EVERY)
+        factors = compute_alpha_score_from_state(source)
+    else:
+        source = FeatureContext(df)
+        factors = compute_alpha_score_from_df(source)
+
+    item, reason = None, None
+    if factors is not None:
+        item = {"ticker": ticker, "alpha_score": int(factors["alpha_score"]), "factors": factors}
+    else:
+        reason = _factor_failure(source)
+        METRICS.fail(reason, ticker)
+    if REUSE_UNCHANGED:
+        FINGERPRINTS.put(ticker, fp, dict(item) if item is not None else None, reason)
+    return (item, source) if item is not None else None
+
+
+def _add_targets(item: Dict, source) -> Optional[Dict]:
+    if "targets" in item:
+        # reused from an unchanged fingerprint
+        return item
+
+    if isinstance(source, StreamingFactorState):
+        if source.count < 20:
+            return None
+        targets = price_targets_from_levels(source.prev_close, source.atr())
+    else:
+        targets = compute_price_targets_from_df(source)
     if targets is None:
+        METRICS.fail(NO_TARGETS, item["ticker"])
+        return None
+
+    if REUSE_UNCHANGED:
+        FINGERPRINTS.put_targets(item["ticker"], targets)
+    item["targets"] = targets
+    return item
+
+
+def _panel_item(ticker: str, out: Dict[str, np.ndarray], j: int) -> Optional[Dict]:
+    """
+    Scored item (factors + targets) for column j of a factor panel result.
+    """
+    rows = int(out["rows"][j])
+    close_last = _safe_last_float(out["last_price"][j])
+    vol20 = _safe_last_float(out["avg_vol_20d"][j])
+    reason = _filter_reason(rows, close_last, vol20)
+    if reason is not None:
+        METRICS.fail(reason, ticker)
         return None
 
+    atr = out["atr"][j]
+    factors = _compose_factors(
+        int(out["momentum"][j]),
+        int(out["trend_strength"][j]),
+        int(out["volume"][j]),
+        int(out["vol_adj"][j]),
+        atr,
+        close_last,
+        vol20,
+    )
     return {
         "ticker": ticker,
         "alpha_score": int(factors["alpha_score"]),
         "factors": factors,
-        "targets": targets,
+        "targets": price_targets_from_levels(close_last, float(atr)),
     }
 
 
-def rank_sector(sector: str, tickers: List[str]) -> List[Dict]:
-    results: List[Dict] = []
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-        futures = {ex.submit(score_ticker, t): t for t in tickers}
-        for fut in as_completed(futures):
-            item = fut.result()
+def rank_universe_panel(universe: Dict[str, List[str]]) -> Dict[str, List[Dict]]:
+    """
+    Panel scoring mode: downloads the whole universe, loads it once into a
+    panel and scores every ticker in one vectorized pass. Returns
+    sector -> top-N items.
+    """
+    tickers = list(dict.fromkeys(t for sector_tickers in universe.values() for t in sector_tickers))
+    with METRICS.stage("download", cpu=False):
+        frames = download_histories(tickers)
+    with METRICS.stage("panel_build"):
+        panel = PricePanel.from_frames(frames)
+
+    with METRICS.stage("panel_score"):
+        out = compute_factor_panel(panel.high, panel.low, panel.close, panel.volume, open_=panel.open)
+
+    column = {t: j for j, t in enumerate(panel.tickers)}
+    ranked: Dict[str, List[Dict]] = {}
+    for sector, sector_tickers in universe.items():
+        selector = TopNSelector(TOP_N_PER_SECTOR)
+        for t in sector_tickers:
+            METRICS.ticker_done()
+            if t not in column:
+                METRICS.fail(_no_frame_reason(t), t)
+                continue
+            item = _panel_item(t, out, column[t])
             if item is not None:
-                results.append(item)
-
-    # Sort: alpha_score desc, then atr_percent asc (prefer lower vol) as tiebreak
-    results.sort(
-        key=lambda r: (
-            -int(r["alpha_score"]),
-            float(r["factors"].get("atr_percent") or 9999),
-        )
-    )
-    return results[:TOP_N_PER_SECTOR]
+                selector.offer(item)
+        if sector_tickers:
+            ranked[sector] = selector.result()
+    return ranked
+
+
+def _sector_rows(as_of: str, sector: str, ranked: List[Dict]) -> List[Dict]:
+    return [
+        {
+            "as_of_date": as_of,
+            "sector": sector,
+            "rank": idx,
+            "ticker": rec["ticker"],
+            "alpha_score": int(rec["alpha_score"]),
+            "factors": rec["factors"],
+            "targets": rec["targets"],
+        }
+        for idx, rec in enumerate(ranked, start=1)
+    ]
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the daily per-sector recommendations")
+    parser.add_argument("--shard-index", type=int, default=0, help="this runner's shard (0-based)")
+    parser.add_argument("--shard-count", type=int, default=1, help="number of shards the universe is split into")
+    parser.add_argument("--merge", action="store_true", help="merge every shard's candidates and upsert")
+    parser.add_argument("--local-shards", type=int, default=0, help="run N shards as local processes, then merge")
+    parser.add_argument("--all-sectors", action="store_true", help="scan all 11 GICS sectors instead of SECTORS")
+    parser.add_argument("--as-of", default=None, help="as_of_date (default: today)")
+    parser.add_argument("--score-mode", choices=["pipeline", "panel"], default=None, help=f"default: {SCORE_MODE}")
+    return parser.parse_args(argv)
+
+
+def _job_universe(all_sectors: bool = False) -> Dict[str, List[str]]:
+    mapping = sector_to_tickers()  # expects dict: sector -> tickers list
 
+    universe: Dict[str, List[str]] = {}
+    for sector in GICS_SECTORS if all_sectors else SECTORS:
+        sector_list = mapping.get(sector, [])
+        if not sector_list:
+            continue
+        universe[sector] = sector_list[:MAX_TICKERS_PER_SECTOR_SCAN] if MAX_TICKERS_PER_SECTOR_SCAN else sector_list
+    return universe
 
-def upsert_recommendations(rows: List[Dict]) -> None:
-    supabase_url = os.environ["SUPABASE_URL"]
-    service_key = os.environ["SUPABASE_SERVICE_ROLE_KEY"]  # server-side only
-    sb = create_client(supabase_url, service_key)
 
-    # Insert in batches (safe for moderate size)
-    batch_size = 200
-    for i in range(0, len(rows), batch_size):
-        batch = rows[i : i + batch_size]
-        # primary key is (as_of_date, sector, rank) -> upsert ok
-        sb.table("daily_recommendations").upsert(batch).execute()
+def apply_universe_diff(consumer: str, shard_index: int = 0, shard_count: int = 1) -> Optional[Dict]:
+    """
+    Applies membership changes since this job last ran: removed symbols are
+    evicted from the price store, factor state, fingerprints and sector map
+    (re-classified ones from the sector map), and only the added symbols get
+    a full-history backfill. A shard only applies the changes to its own
+    tickers. Returns the diff, or None if nothing changed.
+    """
+    diff = pending_universe_diff(consumer)
+    if diff is None:
+        return None
 
+    if shard_count > 1:
+        touched = diff["removed"] + diff["added"] + list(diff["sector_changed"])
+        mine = {t for t in touched if shard_of(t, shard_count) == shard_index}
+        diff = dict(
+            diff,
+            removed=[t for t in diff["removed"] if t in mine],
+            added=[t for t in diff["added"] if t in mine],
+            sector_changed={t: v for t, v in diff["sector_changed"].items() if t in mine},
+        )
 
-def main() -> None:
-    as_of = dt.date.today().isoformat()
+    removed, changed, added = diff["removed"], list(diff["sector_changed"]), diff["added"]
+    PRICE_STORE.evict(removed)
+    STATE_STORE.evict(removed)
+    FINGERPRINTS.evict(removed)
+    SectorFilter().evict(removed + changed)
+    if added:
+        with METRICS.stage("backfill", cpu=False):
+            download_histories(added)
 
-    mapping = sector_to_tickers()  # expects dict: sector -> tickers list
+    mark_universe_diff_applied(consumer, diff)
+    print(f"Universe changes: {len(added)} added (backfilled), {len(removed)} removed (evicted), {len(changed)} changed sector")
+    return diff
 
-    all_rows: List[Dict] = []
 
-    for sector in SECTORS:
-        sector_list = mapping.get(sector, [])
-        if not sector_list:
-            continue
-
-        tickers = sector_list[:MAX_TICKERS_PER_SECTOR_SCAN] if MAX_TICKERS_PER_SECTOR_SCAN else sector_list
+def merge_shards(as_of: str, shard_count: int) -> int:
+    """
+    Final step of a sharded run: global top N per sector from every shard's
+    candidates, upserted like a single-node run. Returns the rows stored.
+    """
+    merged = merge_candidates(as_of, shard_count, TOP_N_PER_SECTOR)
+    stored_before = UPSERT_SINK.summary()["rows"]
+    for sector, ranked in merged.items():
+        UPSERT_SINK.submit(_sector_rows(as_of, sector, ranked))
+        print(f"[{sector}] merged {len(ranked)} recommendations from {shard_count} shards")
+    UPSERT_SINK.flush()
+    return UPSERT_SINK.summary()["rows"] - stored_before
 
-        ranked = rank_sector(sector, tickers)
 
-        for idx, rec in enumerate(ranked, start=1):
-            all_rows.append(
-                {
-                    "as_of_date": as_of,
-                    "sector": sector,
-                    "rank": idx,
-                    "ticker": rec["ticker"],
-                    "alpha_score": int(rec["alpha_score"]),
-                    "factors": rec["factors"],
-                    "targets": rec["targets"],
-                }
-            )
+def run_local_shards(shard_count: int, extra_args: List[str]) -> None:
+    """
+    Runs every shard as its own process on this machine and waits for them.
+    """
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "jobs.build_recommendations", "--shard-index", str(i), "--shard-count", str(shard_count)]
+            + extra_args
+        )
+        for i in range(shard_count)
+    ]
+    failed = [i for i, p in enumerate(procs) if p.wait() != 0]
+    if failed:
+        raise RuntimeError(f"shards {failed} of {shard_count} failed")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    global PARAMS_HASH
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    as_of = args.as_of or dt.date.today().isoformat()
+
+    if args.local_shards:
+        passthrough = ["--as-of", as_of] + (["--all-sectors"] if args.all_sectors else [])
+        if args.score_mode:
+            passthrough += ["--score-mode", args.score_mode]
+        run_local_shards(args.local_shards, passthrough)
+        args.merge, args.shard_count = True, args.local_shards
+
+    if args.merge:
+        rows = merge_shards(as_of, args.shard_count)
+        if not rows:
+            raise RuntimeError("No recommendations generated. Shard candidates are empty.")
+        print(f"Done. Upserted {rows} rows for {as_of}.")
+        return
+
+    sharded = args.shard_count > 1
+    label = shard_label(args.shard_index, args.shard_count)
+    if sharded:
+        # per-shard local state, so shards on one machine never write the same file
+        FINGERPRINTS.path = FINGERPRINTS.path.with_name(f"fingerprints.{label}.json")
+    METRICS.reset()
+    DOWNLOAD_PROBLEMS.clear()
+
+    with METRICS.stage("universe"):
+        universe = shard_universe(_job_universe(args.all_sectors), args.shard_index, args.shard_count)
+    universe_diff = apply_universe_diff(
+        f"daily_job.{label}" if sharded else "daily_job", args.shard_index, args.shard_count
+    )
 
-        print(f"[{sector}] stored {len(ranked)} recommendations")
+    sink = UPSERT_SINK
+    stored_before = sink.summary()["rows"]
+    checkpoint = RunCheckpoint(f"{as_of}_{label}" if sharded else as_of) if CHECKPOINT_RUNS else None
+    candidates: Dict[str, List[Dict]] = {}
+
+    def store_rows(sector: str, rows: List[Dict]) -> None:
+        if sharded:
+            # a shard only keeps its candidates; the merge step upserts
+            candidates[sector] = rows
+            return
+        # returns at once; the checkpoint marker is written when the batches land
+        on_done = (lambda: checkpoint.mark_upserted(sector)) if checkpoint is not None else None
+        with METRICS.stage("upsert_submit"):
+            sink.submit(rows, on_done=on_done)
+
+    def flush_sector(sector: str, ranked: List[Dict]) -> None:
+        # runs on the pipeline's sink thread as soon as the sector is complete
+        rows = _sector_rows(as_of, sector, ranked)
+        if checkpoint is not None:
+            checkpoint.save_ranked(sector, rows)
+        store_rows(sector, rows)
+        print(f"[{sector}] stored {len(ranked)} recommendations (download concurrency {DOWNLOAD_LIMITER.limit})")
+
+    restored = {}
+    if checkpoint is not None:
+        # resume: finished sectors are skipped, ranked ones only re-upserted
+        for sector in list(universe):
+            if not sharded and checkpoint.is_upserted(sector):
+                print(f"[{sector}] already stored for {as_of}, skipping")
+                del universe[sector]
+                continue
+            rows = checkpoint.ranked(sector)
+            if rows is not None:
+                store_rows(sector, rows)
+                print(f"[{sector}] stored {len(rows)} checkpointed recommendations")
+                del universe[sector]
+        restored = {t: o for t, o in checkpoint.scored().items() if o[0] in REPLAYABLE}
+        if restored:
+            print(f"Resuming {as_of}: {len(restored)} tickers already scored")
+    score_mode = args.score_mode or SCORE_MODE
+    PARAMS_HASH = _params_hash(score_mode)
+    pipeline = None
+    if score_mode == "panel":
+        for sector, top in rank_universe_panel(universe).items():
+            flush_sector(sector, top)
+    else:
+        pipeline = SectorPipeline(
+            fetch=download_histories,
+            score=_score_factors,
+            add_targets=_add_targets,
+            on_sector_done=flush_sector,
+            on_scored=checkpoint.record_ticker if checkpoint is not None else None,
+            top_n=TOP_N_PER_SECTOR,
+            batch_size=PIPELINE_BATCH_SIZE,
+            download_workers=DOWNLOAD_STAGE_WORKERS,
+            score_workers=SCORE_STAGE_WORKERS,
+            metrics=METRICS,
+        )
+        pipeline.run(universe, restored=restored)
+    with METRICS.stage("upsert_drain"):
+        sink.flush()
+    stored = {"rows": sink.summary()["rows"] - stored_before}
+    if sharded:
+        path = write_candidates(as_of, args.shard_index, args.shard_count, candidates)
+        print(f"Shard {args.shard_index + 1}/{args.shard_count}: candidates for {len(candidates)} sectors in {path}")
+
+    selection = pipeline.stats() if pipeline is not None else {}
+    for sector, counts in selection.items():
+        logging.info("[%s] selection: %s", sector, counts)
+    reuse = None
+    if REUSE_UNCHANGED:
+        FINGERPRINTS.save()
+        reuse = FINGERPRINTS.summary()
+        print(f"Tickers reused (unchanged last bar): {reuse['reused']}, recomputed: {reuse['recomputed']}")
+    logging.info("downloads: %s", DOWNLOAD_LIMITER.summary())
+    logging.info("request latency: %s", DOWNLOAD_CALLER.summary())
+
+    if WRITE_METRICS_REPORT:
+        path = METRICS.write(
+            f"{as_of}_{label}" if sharded else as_of,
+            extra={
+                "as_of_date": as_of,
+                "rows_upserted": stored["rows"],
+                "score_mode": score_mode,
+                "universe_diff": {k: v for k, v in universe_diff.items() if k != "snapshot"} if universe_diff else None,
+                "selection": selection,
+                "reuse": reuse,
+                "upserts": sink.summary(),
+                "downloads": DOWNLOAD_LIMITER.summary(),
+                "request_latency": DOWNLOAD_CALLER.summary(),
+            },
+        )
+        print(f"Metrics report: {path}")
 
-    if not all_rows:
+    if sharded:
+        return
+    if not stored["rows"] and not (checkpoint is not None and restored):
         raise RuntimeError("No recommendations generated. Universe may be empty or data downloads failed.")
 
-    upsert_recommendations(all_rows)
-    print(f"Done. Upserted {len(all_rows)} rows for {as_of}.")
+    print(f"Done. Upserted {stored['rows']} rows for {as_of}.")
 
 
 if __name__ == "__main__":
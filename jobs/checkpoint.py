@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+RUNS_DIR = Path("cache") / "runs"
+
+
+def _slug(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+class RunCheckpoint:
+    """
+    Local checkpoint of one job run, keyed by as_of_date:
+
+      cache/runs/<as_of>/scored.jsonl         one line per ticker outcome (append-only)
+      cache/runs/<as_of>/sectors/<s>.json     a sector's ranked rows
+      cache/runs/<as_of>/sectors/<s>.done     that sector's rows were upserted
+
+    A rerun on the same day skips upserted sectors, re-sends ranked-but-not-
+    upserted ones, and replays scored tickers instead of fetching them again.
+    """
+
+    def __init__(self, as_of: str, root: Path | str = RUNS_DIR):
+        self.as_of = as_of
+        self.dir = Path(root) / as_of
+        self.sectors_dir = self.dir / "sectors"
+        self.sectors_dir.mkdir(parents=True, exist_ok=True)
+        self._scored_path = self.dir / "scored.jsonl"
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # Ticker outcomes
+    # ---------------------------------------------------------
+    def scored(self) -> Dict[str, Tuple[str, Optional[Dict]]]:
+        """
+        ticker -> (status, item). A torn last line from a crash is ignored.
+        """
+        out: Dict[str, Tuple[str, Optional[Dict]]] = {}
+        if not self._scored_path.exists():
+            return out
+        with open(self._scored_path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                out[rec["ticker"]] = (rec["status"], rec.get("item"))
+        return out
+
+    def record_ticker(self, sector: str, ticker: str, status: str, item: Optional[Dict]) -> None:
+        line = json.dumps({"sector": sector, "ticker": ticker, "status": status, "item": item}, default=float)
+        with self._lock, open(self._scored_path, "a") as f:
+            f.write(line + "\n")
+
+    # ---------------------------------------------------------
+    # Sector stages
+    # ---------------------------------------------------------
+    def _sector_path(self, sector: str, suffix: str) -> Path:
+        return self.sectors_dir / f"{_slug(sector)}.{suffix}"
+
+    def save_ranked(self, sector: str, rows: List[Dict]) -> None:
+        path = self._sector_path(sector, "json")
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(rows, f, default=float)
+        os.replace(tmp, path)
+
+    def ranked(self, sector: str) -> Optional[List[Dict]]:
+        path = self._sector_path(sector, "json")
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def mark_upserted(self, sector: str) -> None:
+        self._sector_path(sector, "done").touch()
+
+    def is_upserted(self, sector: str) -> bool:
+        return self._sector_path(sector, "done").exists()
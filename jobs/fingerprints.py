@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+FINGERPRINT_PATH = Path("cache") / "fingerprints.json"
+
+
+def params_hash(params: Dict) -> str:
+    """
+    Stable short hash of the scoring parameters; changing any of them
+    invalidates every stored fingerprint.
+    """
+    blob = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.sha1(blob).hexdigest()[:12]
+
+
+def frame_fingerprint(df: Optional[pd.DataFrame], params: str) -> Optional[str]:
+    """
+    last bar date | last close | last volume | params hash, or None when
+    the frame has no usable last bar.
+    """
+    if df is None or df.empty or "Close" not in df or "Volume" not in df:
+        return None
+    close = float(df["Close"].iloc[-1])
+    volume = float(df["Volume"].iloc[-1])
+    if not (math.isfinite(close) and math.isfinite(volume)):
+        return None
+    date = pd.Timestamp(df.index[-1]).date().isoformat()
+    return f"{date}|{close!r}|{volume!r}|{params}"
+
+
+class FingerprintStore:
+    """
+    ticker -> {"fp", "item", "targets"}: the last scoring result of each
+    ticker and the fingerprint of the bar it was computed from. `item` is
+    None when the ticker was filtered out (with the failure `reason`);
+    `targets` is only present once they were computed (pruned tickers never
+    get them).
+
+    One JSON file, loaded lazily and replaced atomically by save().
+    """
+
+    def __init__(self, path: Path | str = FINGERPRINT_PATH):
+        self.path = Path(path)
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.recomputed = 0
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def lookup(self, ticker: str, fp: Optional[str]) -> Optional[Dict]:
+        """
+        The stored entry if its fingerprint matches, else None.
+        Counts every call as reused or recomputed.
+        """
+        with self._lock:
+            entry = self._load().get(ticker) if fp is not None else None
+            if entry is not None and entry.get("fp") == fp:
+                self.reused += 1
+                return entry
+            self.recomputed += 1
+            return None
+
+    def put(self, ticker: str, fp: Optional[str], item: Optional[Dict], reason: Optional[str] = None) -> None:
+        if fp is None:
+            return
+        entry = {"fp": fp, "item": item}
+        if reason is not None:
+            entry["reason"] = reason
+        with self._lock:
+            self._load()[ticker] = entry
+
+    def put_targets(self, ticker: str, targets: Dict) -> None:
+        """
+        Attaches targets to the entry recorded for this ticker in this run.
+        """
+        with self._lock:
+            entry = self._load().get(ticker)
+            if entry is not None:
+                entry["targets"] = targets
+
+    def evict(self, tickers) -> int:
+        with self._lock:
+            entries = self._load()
+            return sum(entries.pop(t, None) is not None for t in tickers)
+
+    def save(self) -> None:
+        with self._lock:
+            if self._entries is None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(self._entries, f, default=float)
+            os.replace(tmp, self.path)
+
+    def summary(self) -> Dict[str, int]:
+        return {"reused": self.reused, "recomputed": self.recomputed}
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+REPORTS_DIR = Path("cache") / "reports"
+
+# Why a ticker produced no recommendation
+EMPTY_FRAME = "empty_frame"
+DOWNLOAD_ERROR = "download_error"
+MISSING_COLUMN = "missing_column"
+BELOW_MIN_HISTORY = "below_min_history"
+LIQUIDITY_FILTER = "liquidity_filter"
+NO_TARGETS = "no_targets"
+EXCEPTION = "exception"
+
+FAILURE_EXAMPLES = 5  # tickers kept per failure reason
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    arr = np.asarray(samples, dtype=float)
+    return {
+        "count": int(arr.size),
+        "p50": round(float(np.percentile(arr, 50)), 4),
+        "p95": round(float(np.percentile(arr, 95)), 4),
+        "p99": round(float(np.percentile(arr, 99)), 4),
+        "max": round(float(arr.max()), 4),
+    }
+
+
+class JobMetrics:
+    """
+    Thread-safe run instrumentation: wall and CPU time per stage, latency
+    samples, processed ticker count and a failure taxonomy.
+
+    CPU time is the calling thread's (time.thread_time), so stages running
+    on several threads add up their own CPU rather than the whole process's.
+    A stage that hands its work to pool threads passes cpu=False, since the
+    calling thread's CPU would miss that work; its cpu is reported as None.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.perf_counter()
+            self.started_cpu = time.process_time()
+            self.started_at = dt.datetime.now(dt.timezone.utc)
+            self.stages: Dict[str, Dict[str, float]] = {}
+            self.latencies: Dict[str, List[float]] = {}
+            self.failures: Counter = Counter()
+            self.failure_examples: Dict[str, List[str]] = {}
+            self.tickers = 0
+
+    # ---------------------------------------------------------
+    # Recording
+    # ---------------------------------------------------------
+    @contextmanager
+    def stage(self, name: str, latency: Optional[str] = None, cpu: bool = True):
+        """
+        Times one call of a stage. With `latency`, the call's wall time is
+        also recorded as one latency sample under that name.
+        """
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, used = time.perf_counter() - wall0, time.thread_time() - cpu0
+            with self._lock:
+                s = self.stages.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0 if cpu else None})
+                s["calls"] += 1
+                s["wall"] += wall
+                if s["cpu"] is not None:
+                    s["cpu"] += used
+                if latency:
+                    self.latencies.setdefault(latency, []).append(wall)
+
+    def latency(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def ticker_done(self) -> None:
+        with self._lock:
+            self.tickers += 1
+
+    def fail(self, reason: str, ticker: str) -> None:
+        with self._lock:
+            self.failures[reason] += 1
+            examples = self.failure_examples.setdefault(reason, [])
+            if len(examples) < FAILURE_EXAMPLES:
+                examples.append(ticker)
+
+    # ---------------------------------------------------------
+    # Report
+    # ---------------------------------------------------------
+    def report(self, extra: Optional[Dict] = None) -> Dict:
+        wall = time.perf_counter() - self.started
+        with self._lock:
+            out = {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "wall_seconds": round(wall, 3),
+                "cpu_seconds": round(time.process_time() - self.started_cpu, 3),
+                "tickers": self.tickers,
+                "tickers_per_second": round(self.tickers / wall, 2) if wall > 0 else None,
+                "stages": {
+                    name: {
+                        "calls": int(s["calls"]),
+                        "wall": round(s["wall"], 3),
+                        "cpu": round(s["cpu"], 3) if s["cpu"] is not None else None,
+                    }
+                    for name, s in self.stages.items()
+                },
+                "latency": {name: _percentiles(v) for name, v in self.latencies.items()},
+                "failures": dict(self.failures),
+                "failure_examples": {k: list(v) for k, v in self.failure_examples.items()},
+            }
+        if extra:
+            out.update(extra)
+        return out
+
+    def write(self, as_of: str, extra: Optional[Dict] = None, root: Path | str = REPORTS_DIR) -> Path:
+        """
+        Writes the report to <root>/<as_of>_<HHMMSS>.json and returns the path.
+        """
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        path = root / f"{as_of}_{self.started_at.strftime('%H%M%S')}.json"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.report(extra), f, indent=2, default=str)
+        os.replace(tmp, path)
+        return path
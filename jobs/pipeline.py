@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from analysis.ranking import rank_key
+from jobs.metrics import EXCEPTION, JobMetrics
+from jobs.topn import TopNSelector
+
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # end-of-stream marker
+
+# per-ticker outcome of the scoring stage
+SCORED = "scored"  # factors + targets, offered to the sector's top N
+PRUNED = "pruned"  # factors only: could not reach the top N, targets skipped
+REJECTED = "rejected"  # factors ok but no targets
+SKIPPED = "skipped"  # no data, filtered out, or failed
+
+# outcomes worth checkpointing; SKIPPED tickers (often throttled downloads)
+# are scheduled again on a resumed run
+REPLAYABLE = (SCORED, PRUNED, REJECTED)
+
+
+class SectorPipeline:
+    """
+    One producer/consumer pipeline over the whole universe:
+
+      download workers -> scoring workers -> sink
+
+    Download workers pull ticker chunks (all sectors, sector by sector) and
+    push each frame downstream as soon as its chunk lands; scoring workers
+    turn frames into scored items; a single sink thread keeps the per-sector
+    results and calls `on_sector_done(sector, ranked)` the moment the last
+    ticker of a sector has been scored, while other sectors are still running.
+
+    Scoring is two-phase: `score(ticker, df)` returns (item, source) with the
+    factors only, and `add_targets(item, source)` is called only if the item
+    can still enter its sector's top N. Each sector keeps just a bounded heap.
+
+    `on_scored(sector, ticker, status, item)` sees every REPLAYABLE outcome
+    (for checkpointing), and such outcomes passed to run() as `restored` are
+    replayed into the sink instead of being downloaded and scored again.
+
+    Stage timings, latency samples and scoring exceptions go to `metrics`.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[str]], Dict[str, pd.DataFrame]],
+        score: Callable[[str, Optional[pd.DataFrame]], Optional[Tuple[Dict, Any]]],
+        add_targets: Callable[[Dict, Any], Optional[Dict]],
+        on_sector_done: Callable[[str, List[Dict]], None],
+        on_scored: Optional[Callable[[str, str, str, Optional[Dict]], None]] = None,
+        top_n: int = 10,
+        batch_size: int = 50,
+        download_workers: int = 4,
+        score_workers: int = 4,
+        queue_size: int = 256,
+        metrics: Optional[JobMetrics] = None,
+    ):
+        self.fetch = fetch
+        self.score = score
+        self.add_targets = add_targets
+        self.on_sector_done = on_sector_done
+        self.on_scored = on_scored
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.download_workers = download_workers
+        self.score_workers = score_workers
+        self.queue_size = queue_size
+        self.metrics = metrics or JobMetrics()
+        self.flush_errors: List[Exception] = []
+        self.selectors: Dict[str, TopNSelector] = {}
+
+    # ---------------------------------------------------------
+    # Stages
+    # ---------------------------------------------------------
+    def _download_stage(self, chunks: queue.Queue, frames: queue.Queue) -> None:
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                return
+            tickers = [t for _, t in chunk]
+            start = time.perf_counter()
+            try:
+                with self.metrics.stage("download", latency="download_chunk", cpu=False):
+                    got = self.fetch(tickers)
+            except Exception:
+                logger.exception("download stage failed for %d tickers", len(tickers))
+                got = {}
+            for sector, t in chunk:
+                frames.put((sector, t, got.get(t), start))
+
+    def _score_stage(self, frames: queue.Queue, results: queue.Queue) -> None:
+        while True:
+            job = frames.get()
+            if job is _DONE:
+                return
+            sector, t, df, start = job
+            status, item = SKIPPED, None
+            try:
+                with self.metrics.stage("factors", latency="factors"):
+                    scored = self.score(t, df)
+                if scored is not None:
+                    item, source = scored
+                    if not self.selectors[sector].would_accept(rank_key(item)):
+                        # cannot reach the top N any more: skip the targets work
+                        status, item = PRUNED, None
+                    else:
+                        with self.metrics.stage("targets", latency="targets"):
+                            item = self.add_targets(item, source)
+                        status = SCORED if item is not None else REJECTED
+            except Exception:
+                logger.exception("scoring failed for %s", t)
+                self.metrics.fail(EXCEPTION, t)
+                status, item = SKIPPED, None
+            self.metrics.latency("ticker", time.perf_counter() - start)
+            results.put((sector, t, status, item, False))
+
+    def _sink_stage(self, results: queue.Queue, remaining: Dict[str, int], ranked: Dict[str, List[Dict]]) -> None:
+        while True:
+            msg = results.get()
+            if msg is _DONE:
+                return
+            sector, t, status, item, replayed = msg
+            selector = self.selectors[sector]
+            if status == SCORED:
+                selector.offer(item)
+            elif status in (PRUNED, REJECTED):
+                selector.reject(pruned=status == PRUNED)
+
+            if not replayed and status in REPLAYABLE and self.on_scored is not None:
+                try:
+                    self.on_scored(sector, t, status, item)
+                except Exception:
+                    logger.exception("checkpoint write failed for %s", t)
+
+            self.metrics.ticker_done()
+            remaining[sector] -= 1
+            if remaining[sector] == 0:
+                top = selector.result()
+                ranked[sector] = top
+                try:
+                    with self.metrics.stage("flush"):
+                        self.on_sector_done(sector, top)
+                except Exception as e:
+                    # keep draining the other sectors; run() re-raises at the end
+                    logger.exception("sector flush failed for %s", sector)
+                    self.flush_errors.append(e)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Per-sector counts of examined, kept and pruned (no targets computed) tickers.
+        """
+        return {s: sel.stats() for s, sel in self.selectors.items()}
+
+    # ---------------------------------------------------------
+    # Run
+    # ---------------------------------------------------------
+    def run(
+        self,
+        sector_tickers: Dict[str, List[str]],
+        restored: Optional[Dict[str, Tuple[str, Optional[Dict]]]] = None,
+    ) -> Dict[str, List[Dict]]:
+        """
+        Scores every (sector, ticker) and returns sector -> top-N items.
+        Sectors with no tickers are skipped. `restored` maps ticker ->
+        (status, item) from an earlier, interrupted run.
+        """
+        restored = restored or {}
+        remaining = {s: len(tickers) for s, tickers in sector_tickers.items() if tickers}
+        ranked: Dict[str, List[Dict]] = {}
+        self.selectors = {s: TopNSelector(self.top_n) for s in remaining}
+        if not remaining:
+            return ranked
+
+        chunks: queue.Queue = queue.Queue()
+        frames: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        results: queue.Queue = queue.Queue()
+
+        work = []
+        for s, tickers in sector_tickers.items():
+            for t in tickers:
+                if t in restored and restored[t][0] in REPLAYABLE:
+                    status, item = restored[t]
+                    results.put((s, t, status, item, True))
+                else:
+                    work.append((s, t))
+
+        for i in range(0, len(work), self.batch_size):
+            chunks.put(work[i : i + self.batch_size])
+        for _ in range(self.download_workers):
+            chunks.put(_DONE)
+
+        downloaders = [
+            threading.Thread(target=self._download_stage, args=(chunks, frames), name=f"download-{i}")
+            for i in range(self.download_workers)
+        ]
+        scorers = [
+            threading.Thread(target=self._score_stage, args=(frames, results), name=f"score-{i}")
+            for i in range(self.score_workers)
+        ]
+        sink = threading.Thread(target=self._sink_stage, args=(results, remaining, ranked), name="sink")
+
+        for th in downloaders + scorers + [sink]:
+            th.start()
+
+        for th in downloaders:
+            th.join()
+        for _ in scorers:
+            frames.put(_DONE)
+        for th in scorers:
+            th.join()
+        results.put(_DONE)
+        sink.join()
+
+        if self.flush_errors:
+            raise self.flush_errors[0]
+        return ranked
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+from jobs.topn import TopNSelector
+
+
+SHARDS_DIR = Path("cache") / "shards"
+
+
+def shard_of(ticker: str, shard_count: int) -> int:
+    """
+    Stable shard for a ticker: same answer on every machine and Python run
+    (unlike hash(), which is salted per process).
+    """
+    digest = hashlib.sha1(ticker.upper().encode()).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def shard_universe(universe: Dict[str, List[str]], shard_index: int, shard_count: int) -> Dict[str, List[str]]:
+    """
+    This shard's slice of sector -> tickers, order preserved.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard index {shard_index} out of range for {shard_count} shards")
+    if shard_count == 1:
+        return universe
+    return {s: [t for t in tickers if shard_of(t, shard_count) == shard_index] for s, tickers in universe.items()}
+
+
+def shard_label(shard_index: int, shard_count: int) -> str:
+    return f"shard-{shard_index}-of-{shard_count}"
+
+
+def write_candidates(
+    as_of: str,
+    shard_index: int,
+    shard_count: int,
+    candidates: Dict[str, List[Dict]],
+    root: Path | str = SHARDS_DIR,
+) -> Path:
+    """
+    Writes one shard's per-sector top-N candidates (scored items with
+    targets) to <root>/<as_of>/<shard label>.json.
+    """
+    out_dir = Path(root) / as_of
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"{shard_label(shard_index, shard_count)}.json"
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(
+            {"as_of_date": as_of, "shard_index": shard_index, "shard_count": shard_count, "sectors": candidates},
+            f,
+            default=float,
+        )
+    os.replace(tmp, path)
+    return path
+
+
+def merge_candidates(as_of: str, shard_count: int, top_n: int, root: Path | str = SHARDS_DIR) -> Dict[str, List[Dict]]:
+    """
+    Global top N per sector from every shard's candidates. Each shard kept
+    its own top N, so the global top N is always among them; rank_key is a
+    total order, so the result equals a single-node run.
+    Raises FileNotFoundError if a shard has not written its candidates.
+    """
+    out_dir = Path(root) / as_of
+    missing = [i for i in range(shard_count) if not (out_dir / f"{shard_label(i, shard_count)}.json").exists()]
+    if missing:
+        raise FileNotFoundError(f"missing candidates for shards {missing} of {shard_count} in {out_dir}")
+
+    selectors: Dict[str, TopNSelector] = {}
+    for i in range(shard_count):
+        with open(out_dir / f"{shard_label(i, shard_count)}.json") as f:
+            data = json.load(f)
+        for sector, items in data["sectors"].items():
+            selector = selectors.setdefault(sector, TopNSelector(top_n))
+            for item in items:
+                selector.offer(item)
+
+    return {sector: selector.result() for sector, selector in selectors.items()}
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from postgrest.types import ReturnMethod
+from supabase import Client, create_client
+
+from utils.reco_store import SQLiteRecoStore
+
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_TABLE = "daily_recommendations"
+RECOMMENDATIONS_KEY = "as_of_date,sector,rank"
+
+# factors that duplicate a column of the row itself
+_REDUNDANT_FACTORS = ("alpha_score",)
+_INT_FIELDS = ("avg_vol_20d",)
+_FLOAT_DIGITS = 4
+
+
+def _compact_value(key: str, value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        if key in _INT_FIELDS:
+            return int(round(value))
+        return round(value, _FLOAT_DIGITS)
+    return value
+
+
+def compact_row(row: Dict) -> Dict:
+    """
+    Shrinks a recommendation row for the wire: drops factors duplicated by
+    row columns and null entries, rounds floats and unwraps numpy scalars.
+    """
+    out = dict(row)
+    for field in ("factors", "targets"):
+        blob = row.get(field)
+        if not isinstance(blob, dict):
+            continue
+        out[field] = {
+            k: _compact_value(k, v)
+            for k, v in blob.items()
+            if v is not None and not (field == "factors" and k in _REDUNDANT_FACTORS)
+        }
+    return out
+
+
+class SupabaseSink:
+    """
+    Streams recommendation rows to Supabase through one long-lived client.
+
+    submit() splits rows into batches and returns immediately; up to
+    `max_in_flight` batches are sent concurrently. `on_done` is called once
+    every batch of that submission is stored. flush() waits for everything
+    sent so far and raises the first failure.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        key: Optional[str] = None,
+        table: str = RECOMMENDATIONS_TABLE,
+        on_conflict: str = RECOMMENDATIONS_KEY,
+        batch_size: int = 200,
+        max_in_flight: int = 4,
+        client: Optional[Client] = None,
+    ):
+        self.url = url
+        self.key = key
+        self.table = table
+        self.on_conflict = on_conflict
+        self.batch_size = batch_size
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="upsert")
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+
+        self.rows = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.send_seconds = 0.0
+
+    @property
+    def client(self) -> Client:
+        with self._client_lock:
+            if self._client is None:
+                url = self.url or os.environ["SUPABASE_URL"]
+                key = self.key or os.environ["SUPABASE_SERVICE_ROLE_KEY"]  # server-side only
+                self._client = create_client(url, key)
+            return self._client
+
+    def _send(self, batch: List[Dict]) -> None:
+        start = time.perf_counter()
+        try:
+            self.client.table(self.table).upsert(
+                batch, on_conflict=self.on_conflict, returning=ReturnMethod.minimal
+            ).execute()
+        except Exception:
+            with self._lock:
+                self.failed_batches += 1
+            raise
+        with self._lock:
+            self.rows += len(batch)
+            self.batches += 1
+            self.send_seconds += time.perf_counter() - start
+
+    def submit(self, rows: List[Dict], on_done: Optional[Callable[[], None]] = None) -> List[Future]:
+        rows = [compact_row(r) for r in rows]
+        futures = [
+            self._pool.submit(self._send, rows[i : i + self.batch_size])
+            for i in range(0, len(rows), self.batch_size)
+        ]
+        with self._lock:
+            self._futures.extend(futures)
+
+        if on_done is not None:
+            if not futures:
+                on_done()
+            else:
+                pending = {"n": len(futures)}
+
+                def _one_done(f: Future) -> None:
+                    if f.exception() is not None:
+                        return
+                    with self._lock:
+                        pending["n"] -= 1
+                        last = pending["n"] == 0
+                    if last:
+                        on_done()
+
+                for f in futures:
+                    f.add_done_callback(_one_done)
+        return futures
+
+    def flush(self) -> None:
+        with self._lock:
+            futures, self._futures = self._futures, []
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "rows": self.rows,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "send_seconds": round(self.send_seconds, 3),
+            }
+
+
+class SQLiteSink:
+    """
+    Same interface as SupabaseSink over a local SQLiteRecoStore: each
+    submit() is written synchronously in one transaction.
+    """
+
+    def __init__(self, store: SQLiteRecoStore):
+        self.store = store
+        self.rows = 0
+        self.batches = 0
+        self.send_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def submit(self, rows: List[Dict], on_done: Optional[Callable[[], None]] = None) -> List[Future]:
+        start = time.perf_counter()
+        if rows:
+            self.store.upsert([compact_row(r) for r in rows])
+        with self._lock:
+            self.rows += len(rows)
+            self.batches += 1 if rows else 0
+            self.send_seconds += time.perf_counter() - start
+        if on_done is not None:
+            on_done()
+        return []
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {"rows": self.rows, "batches": self.batches, "send_seconds": round(self.send_seconds, 3)}
+
+
+class FanoutSink:
+    """
+    Sends every submission to several sinks; `on_done` fires once all of
+    them have stored it. Row counts are the first sink's.
+    """
+
+    def __init__(self, sinks: List):
+        self.sinks = list(sinks)
+        self._lock = threading.Lock()
+
+    def submit(self, rows: List[Dict], on_done: Optional[Callable[[], None]] = None) -> List[Future]:
+        callback = None
+        if on_done is not None:
+            pending = {"n": len(self.sinks)}
+
+            def callback() -> None:
+                with self._lock:
+                    pending["n"] -= 1
+                    last = pending["n"] == 0
+                if last:
+                    on_done()
+
+        futures: List[Future] = []
+        for sink in self.sinks:
+            futures.extend(sink.submit(rows, on_done=callback))
+        return futures
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+    def summary(self) -> Dict:
+        out = dict(self.sinks[0].summary())
+        out["sinks"] = [type(s).__name__ for s in self.sinks]
+        return out
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import heapq
+import threading
+from typing import Callable, Dict, List
+
+from analysis.ranking import rank_key
+
+
+class _Worst:
+    """
+    Heap entry ordered so the worst-ranked item sits at the top of heapq's min-heap.
+    """
+
+    __slots__ = ("key", "item")
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+
+    def __lt__(self, other: "_Worst") -> bool:
+        return self.key > other.key
+
+
+class TopNSelector:
+    """
+    Keeps only the best `n` items seen so far (bounded heap), under the same
+    ordering as rank_key. Safe to share between threads.
+
+    `would_accept(key)` lets callers skip expensive work (e.g. price targets)
+    for items that can no longer make the cut: the admission threshold only
+    ever tightens, so a rejection is final.
+    """
+
+    def __init__(self, n: int, key: Callable[[Dict], tuple] = rank_key):
+        self.n = n
+        self.key = key
+        self._heap: List[_Worst] = []
+        self._lock = threading.Lock()
+        self.examined = 0
+        self.pruned = 0
+
+    def would_accept(self, key) -> bool:
+        with self._lock:
+            return self.n > 0 and (len(self._heap) < self.n or key < self._heap[0].key)
+
+    def reject(self, pruned: bool = True) -> None:
+        """
+        Counts an item that was examined but dropped before offer();
+        `pruned` marks it as skipped because it could not make the cut.
+        """
+        with self._lock:
+            self.examined += 1
+            self.pruned += int(pruned)
+
+    def offer(self, item: Dict) -> bool:
+        k = self.key(item)
+        with self._lock:
+            self.examined += 1
+            if self.n <= 0:
+                return False
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, _Worst(k, item))
+                return True
+            if k < self._heap[0].key:
+                heapq.heapreplace(self._heap, _Worst(k, item))
+                return True
+            return False
+
+    @property
+    def kept(self) -> int:
+        return len(self._heap)
+
+    def result(self) -> List[Dict]:
+        with self._lock:
+            return [e.item for e in sorted(self._heap, key=lambda e: e.key)]
+
+    def stats(self) -> Dict[str, int]:
+        return {"examined": self.examined, "kept": self.kept, "pruned": self.pruned}
@@ -1,7 +1,7 @@
 import streamlit as st
-import yfinance as yf
 
-from utils.supabase_client import get_supabase_client
+from utils.price_store import get_price_store
+from utils.reco_store import get_reco_source
 
 from ui.charts import tradingview_chart
 from ui.analytics_cards import volatility_meter, confidence_gauge, target_cards
@@ -15,35 +15,8 @@ from utils.state import add_to_watchlist
 
 
 def _fetch_latest_sector_recos(sector: str, limit: int = 3):
-    sb = get_supabase_client()
-
-    # 1) get latest date for this sector
-    resp = (
-        sb.table("daily_recommendations")
-        .select("as_of_date")
-        .eq("sector", sector)
-        .order("as_of_date", desc=True)
-        .limit(1)
-        .execute()
-    )
-
-    if not resp.data:
-        return None, []
-
-    latest_date = resp.data[0]["as_of_date"]
-
-    # 2) get top N rows for that sector/date
-    resp2 = (
-        sb.table("daily_recommendations")
-        .select("rank,ticker,alpha_score,factors,targets")
-        .eq("sector", sector)
-        .eq("as_of_date", latest_date)
-        .order("rank", desc=False)
-        .limit(limit)
-        .execute()
-    )
-
-    return latest_date, (resp2.data or [])
+    # Supabase by default; a local SQLite file with ALPHABEACON_RECOS_BACKEND=sqlite
+    return get_reco_source().latest_sector_recos(sector, limit)
 
 
 def sector_page(sector):
@@ -75,8 +48,7 @@ def sector_page(sector):
         targets = rec.get("targets") or {}
 
         # Pull last price for options card
-        df5 = yf.download(t, period="5d", progress=False)
-        last_price = df5["Close"].iloc[-1] if df5 is not None and len(df5) else None
+        last_price = get_price_store().last_price(t)
 
         tech_score = int(factors.get("tech_score", 50))
         sent_score = int(factors.get("sent_score", 70))
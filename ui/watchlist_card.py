@@ -1,12 +1,12 @@
 import streamlit as st
-import yfinance as yf
+from utils.price_store import get_price_store
 from utils.state import remove_from_watchlist
 
 
 def watchlist_card(ticker):
 
-    df = yf.download(ticker, period="5d", progress=False)
-    last_price = round(df["Close"].iloc[-1], 2)
+    price = get_price_store().last_price(ticker)
+    last_price = round(price, 2) if price is not None else "—"
 
     st.markdown(
         f"""
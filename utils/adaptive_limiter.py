@@ -0,0 +1,167 @@
+# utils/adaptive_limiter.py
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for outbound requests.
+
+    The limit grows by one after a full "round" of healthy requests (as many
+    successes as the current limit, with error rate and latency under their
+    targets) and is halved on an error, timeout or empty response. Halving is
+    rate-limited by a cooldown so one burst of failures counts once.
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_target: float = 8.0,
+        error_threshold: float = 0.1,
+        window: int = 20,
+        cooldown: float = 2.0,
+        name: str = "downloads",
+    ):
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.name = name
+
+        self._in_flight = 0
+        self._successes_in_round = 0
+        self._last_decrease = 0.0
+        self._outcomes: deque = deque(maxlen=window)  # (ok, latency)
+        self._cond = threading.Condition()
+
+        self.peak_limit = self.limit
+        self.decisions = 0
+
+    # ---------------------------------------------------------
+    # Slots
+    # ---------------------------------------------------------
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a slot only if one is free right now.
+        """
+        with self._cond:
+            if self._in_flight >= self.limit:
+                return False
+            self._in_flight += 1
+            return True
+
+    def discard(self) -> None:
+        """
+        Returns a slot whose request never ran, without recording an outcome.
+        """
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def release(self, ok: bool, latency: float) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._outcomes.append((ok, latency))
+            if ok:
+                self._on_success()
+            else:
+                self._on_failure(latency)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """
+        with limiter.slot() as s:
+            ... do the request ...
+            s.ok = got_data
+        """
+        outcome = _Outcome()
+        self.acquire()
+        start = time.perf_counter()
+        try:
+            yield outcome
+        except Exception:
+            outcome.ok = False
+            raise
+        finally:
+            self.release(outcome.ok, time.perf_counter() - start)
+
+    # ---------------------------------------------------------
+    # AIMD rules (called with the lock held)
+    # ---------------------------------------------------------
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for ok, _ in self._outcomes if not ok) / len(self._outcomes)
+
+    def mean_latency(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(lat for _, lat in self._outcomes) / len(self._outcomes)
+
+    def _on_success(self) -> None:
+        self._successes_in_round += 1
+        if self._successes_in_round < self.limit:
+            return
+        self._successes_in_round = 0
+
+        healthy = self.error_rate() <= self.error_threshold and self.mean_latency() <= self.latency_target
+        if healthy and self.limit < self.max_limit:
+            self._set_limit(self.limit + 1, "healthy round")
+
+    def _on_failure(self, latency: float) -> None:
+        self._successes_in_round = 0
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        if self.limit > self.min_limit:
+            self._set_limit(max(self.min_limit, self.limit // 2), f"failure after {latency:.1f}s")
+
+    def _set_limit(self, new: int, reason: str) -> None:
+        logger.info(
+            "[%s] concurrency %d -> %d (%s; error rate %.0f%%, mean latency %.2fs)",
+            self.name,
+            self.limit,
+            new,
+            reason,
+            self.error_rate() * 100,
+            self.mean_latency(),
+        )
+        self.limit = new
+        self.peak_limit = max(self.peak_limit, new)
+        self.decisions += 1
+
+    def summary(self) -> dict:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "peak_limit": self.peak_limit,
+                "decisions": self.decisions,
+                "error_rate": round(self.error_rate(), 3),
+                "mean_latency": round(self.mean_latency(), 3),
+            }
+
+
+class _Outcome:
+    def __init__(self):
+        self.ok: Optional[bool] = True
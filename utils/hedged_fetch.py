@@ -0,0 +1,207 @@
+# utils/hedged_fetch.py
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+from tenacity import Retrying, stop_after_attempt, wait_random_exponential
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """A request (including its hedge) did not answer within the deadline."""
+
+
+class EmptyResponse(Exception):
+    """The provider answered but returned no rows."""
+
+
+def _release(limiter, future, state: Dict, latency: float) -> None:
+    # an answer without rows is not a failure; an error or a timeout is
+    if future.cancelled():
+        limiter.discard()
+        return
+    error = future.exception()
+    ok = not state["expired"] and (error is None or isinstance(error, EmptyResponse))
+    limiter.release(ok, latency)
+
+
+class HedgedCaller:
+    """
+    Runs a request with a per-attempt deadline, bounded retries with jittered
+    exponential backoff (tenacity), and optional hedging: once an attempt has
+    been running longer than the observed p95 latency, a duplicate is issued
+    and whichever answers first wins.
+
+    Attempt counts, hedges and latency are recorded per key (ticker).
+
+    With a `limiter`, every request issued (hedges included) holds its own
+    slot from submission until it returns, even when it outlives the
+    deadline; no slot is held during backoff, and a hedge is only issued
+    when a slot is free.
+    """
+
+    def __init__(
+        self,
+        deadline: float = 20.0,
+        attempts: int = 3,
+        hedge: bool = True,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        min_samples: int = 20,
+        hedge_floor: float = 0.25,
+        pool_size: int = 64,
+    ):
+        self.deadline = deadline
+        self.attempts = attempts
+        self.hedge = hedge
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.min_samples = min_samples
+        self.hedge_floor = hedge_floor
+
+        self._latencies: deque = deque(maxlen=500)
+        self._lock = threading.Lock()
+        # attempts run here so the caller can stop waiting on a hung one
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="hedged")
+
+        self.stats: Dict[str, Dict] = {}
+
+    # ---------------------------------------------------------
+    # Latency tracking
+    # ---------------------------------------------------------
+    def _observe(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            return float(np.percentile(np.fromiter(self._latencies, dtype=float), q))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        p95 = self.percentile(95)
+        return None if p95 is None else max(p95, self.hedge_floor)
+
+    # ---------------------------------------------------------
+    # Calls
+    # ---------------------------------------------------------
+    def _submit(self, fn: Callable, args: tuple, limiter, state: Dict, block: bool = True):
+        """
+        Issues one request in the pool under its own limiter slot. Returns
+        None when `block` is False and no slot is free.
+        """
+        if limiter is not None:
+            if block:
+                limiter.acquire()
+            elif not limiter.try_acquire():
+                return None
+        started = time.perf_counter()
+        future = self._pool.submit(fn, *args)
+        if limiter is not None:
+            future.add_done_callback(lambda f: _release(limiter, f, state, time.perf_counter() - started))
+        return future
+
+    def _attempt(self, fn: Callable, args: tuple, record: Dict, limiter=None):
+        state = {"expired": False}
+        futures = [self._submit(fn, args, limiter, state)]
+        start = time.perf_counter()
+        hedge_after = self.hedge_delay()
+        hedged = False
+        error: Optional[BaseException] = None
+
+        while futures:
+            elapsed = time.perf_counter() - start
+            remaining = self.deadline - elapsed
+            if remaining <= 0:
+                break
+
+            timeout = remaining
+            if hedge_after is not None and not hedged:
+                timeout = min(timeout, max(hedge_after - elapsed, 0.0))
+
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    for other in futures:
+                        other.cancel()
+                    self._observe(time.perf_counter() - start)
+                    return f.result()
+                error = f.exception()
+            futures = [f for f in futures if not f.done()]
+
+            if not done and hedge_after is not None and not hedged:
+                hedged = True  # one chance: skipped if the limiter has no free slot
+                duplicate = self._submit(fn, args, limiter, state, block=False)
+                if duplicate is not None:
+                    futures.append(duplicate)
+                    record["hedges"] += 1
+
+        if futures:
+            # requests still running count as timeouts when they finish
+            state["expired"] = True
+            for f in futures:
+                f.cancel()
+            raise DeadlineExceeded(f"no answer after {self.deadline:.0f}s")
+        raise error
+
+    def call(self, fn: Callable, *args, keys: Iterable[str] = (), limiter=None):
+        """
+        Calls fn(*args) under the deadline / hedge / retry policy and returns
+        its result. Raises the last error once every attempt has failed.
+        With `limiter`, each request issued takes a slot of its own.
+        """
+        keys = list(keys)
+        record = {"attempts": 0, "hedges": 0, "latency": 0.0, "ok": False}
+        start = time.perf_counter()
+
+        try:
+            for attempt in Retrying(
+                stop=stop_after_attempt(self.attempts),
+                wait=wait_random_exponential(multiplier=self.backoff, max=self.max_backoff),
+                reraise=True,
+            ):
+                with attempt:
+                    record["attempts"] += 1
+                    result = self._attempt(fn, args, record, limiter)
+                    record["ok"] = True
+                    return result
+        finally:
+            record["latency"] = round(time.perf_counter() - start, 3)
+            with self._lock:
+                for k in keys:
+                    prev = self.stats.get(k)
+                    if prev is None:
+                        self.stats[k] = dict(record)
+                        continue
+                    # a ticker can be requested twice (batch, then single fallback)
+                    prev["attempts"] += record["attempts"]
+                    prev["hedges"] += record["hedges"]
+                    prev["latency"] = round(prev["latency"] + record["latency"], 3)
+                    prev["ok"] = record["ok"]
+
+    def summary(self) -> Dict:
+        with self._lock:
+            records = list(self.stats.values())
+            lat = np.array([r["latency"] for r in records], dtype=float)
+        if not records:
+            return {"tickers": 0}
+        return {
+            "tickers": len(records),
+            "attempts": int(sum(r["attempts"] for r in records)),
+            "hedges": int(sum(r["hedges"] for r in records)),
+            "failed": int(sum(not r["ok"] for r in records)),
+            "p50": round(float(np.percentile(lat, 50)), 3),
+            "p95": round(float(np.percentile(lat, 95)), 3),
+            "p99": round(float(np.percentile(lat, 99)), 3),
+        }
@@ -0,0 +1,538 @@
+# utils/price_store.py
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import yfinance as yf
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar,
+    GoodFriday,
+    Holiday,
+    USLaborDay,
+    USMartinLutherKingJr,
+    USMemorialDay,
+    USPresidentsDay,
+    USThanksgivingDay,
+    nearest_workday,
+    sunday_to_monday,
+)
+
+from utils.adaptive_limiter import AdaptiveLimiter
+from utils.hedged_fetch import EmptyResponse, HedgedCaller
+
+
+STORE_DIR = Path("cache") / "prices"
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+FETCH_BATCH_SIZE = 50  # tickers per multi-ticker yf.download request
+MAX_WORKERS = 8  # concurrent download requests (fixed pool, no limiter)
+REQUEST_TIMEOUT = 10  # seconds per yf.download request
+RETRY_ROUNDS = 2  # extra single-ticker passes for symbols still missing
+INTRADAY_TTL = dt.timedelta(minutes=15)  # how long a live (unfinished) bar is trusted
+ADJUSTMENT_TOLERANCE = 1e-4  # relative close change on the overlap bar that means re-based history
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_CLOSE = dt.time(16, 0)
+_META_KEY = b"alphabeacon"
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+# MARKET CALENDAR HELPERS (NYSE full-day holidays; early closes count as full days)
+# ----------------------------------------------------------
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        Holiday("New Year's Day", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-06-19", observance=nearest_workday),
+        Holiday("Independence Day", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+@lru_cache(maxsize=None)
+def _holidays(year: int) -> frozenset:
+    days = NYSEHolidayCalendar().holidays(dt.date(year, 1, 1), dt.date(year, 12, 31))
+    return frozenset(d.date() for d in days)
+
+
+def is_session(day: dt.date) -> bool:
+    return day.weekday() < 5 and day not in _holidays(day.year)
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.now(MARKET_TZ)
+
+
+def last_session_close(now: Optional[dt.datetime] = None) -> dt.datetime:
+    """
+    Timestamp of the most recent regular-session close at or before `now`.
+    """
+    now = now or _now()
+    day = now.date()
+    if is_session(day) and now.time() >= MARKET_CLOSE:
+        return dt.datetime.combine(day, MARKET_CLOSE, MARKET_TZ)
+    day -= dt.timedelta(days=1)
+    while not is_session(day):
+        day -= dt.timedelta(days=1)
+    return dt.datetime.combine(day, MARKET_CLOSE, MARKET_TZ)
+
+
+def _market_open(now: dt.datetime) -> bool:
+    return is_session(now.date()) and dt.time(9, 30) <= now.time() < MARKET_CLOSE
+
+
+# ----------------------------------------------------------
+# FRAME HELPERS
+# ----------------------------------------------------------
+def clean_history(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    if df is None or df.empty:
+        return None
+    # Standardize columns capitalization, just in case
+    for col in OHLCV_COLUMNS:
+        if col not in df.columns:
+            return None
+    df = df.dropna()
+    return df if not df.empty else None
+
+
+def _note_malformed(df: pd.DataFrame, ticker: str, malformed: Optional[Set[str]]) -> None:
+    # rows came back, but without the full OHLCV column set
+    if malformed is None or df.dropna(how="all").empty:
+        return
+    if any(col not in df.columns for col in OHLCV_COLUMNS):
+        malformed.add(ticker)
+
+
+def split_batch_frame(
+    data: Optional[pd.DataFrame], tickers: List[str], malformed: Optional[Set[str]] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Splits a multi-ticker yf.download frame back into one OHLCV frame per ticker.
+    Tickers with no usable rows are left out of the result; those whose rows
+    lack OHLCV columns are also added to `malformed`.
+    """
+    frames: Dict[str, pd.DataFrame] = {}
+    if data is None or data.empty:
+        return frames
+
+    if not isinstance(data.columns, pd.MultiIndex):
+        # a single-ticker request can come back with flat columns
+        if len(tickers) == 1:
+            _note_malformed(data, tickers[0], malformed)
+            df = clean_history(data)
+            if df is not None:
+                frames[tickers[0]] = df
+        return frames
+
+    # group_by="ticker" puts the symbol on level 0, the default layout on level 1
+    level = 0 if set(tickers) & set(data.columns.get_level_values(0)) else 1
+    available = set(data.columns.get_level_values(level))
+
+    for t in tickers:
+        if t not in available:
+            continue
+        df = data.xs(t, axis=1, level=level)
+        _note_malformed(df, t, malformed)
+        df = clean_history(df)
+        if df is not None:
+            frames[t] = df
+
+    return frames
+
+
+def _download(tickers: List[str], start: dt.date, malformed: Optional[Set[str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    One yf.download request. Raises on transport errors so callers can tell
+    throttling apart from tickers that simply have no data.
+    """
+    data = yf.download(
+        tickers if len(tickers) > 1 else tickers[0],
+        start=start.isoformat(),
+        group_by="ticker",
+        progress=False,
+        auto_adjust=False,
+        threads=True,
+        timeout=REQUEST_TIMEOUT,
+    )
+    return split_batch_frame(data, tickers, malformed)
+
+
+def _download_nonempty(tickers: List[str], start: dt.date, malformed: Optional[Set[str]] = None) -> Dict[str, pd.DataFrame]:
+    seen = set()
+    frames = _download(tickers, start, seen)
+    if malformed is not None:
+        malformed.update(seen)
+    if not frames and not seen:
+        raise EmptyResponse(f"no rows for {len(tickers)} tickers")
+    return frames
+
+
+# ----------------------------------------------------------
+# PRICE STORE
+# ----------------------------------------------------------
+class PriceStore:
+    """
+    Local Parquet OHLCV store, one file per ticker.
+
+    Each file carries the bars plus a small metadata block recording how far
+    back the history is complete and when the ticker was last checked, so a
+    read only goes to the network for the days that are actually missing.
+    """
+
+    def __init__(
+        self,
+        root: Path | str = STORE_DIR,
+        batch_size: int = FETCH_BATCH_SIZE,
+        max_workers: int = MAX_WORKERS,
+        limiter: Optional[AdaptiveLimiter] = None,
+        caller: Optional[HedgedCaller] = None,
+    ):
+        self.root = Path(root)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.limiter = limiter
+        self.caller = caller
+
+    def path(self, ticker: str) -> Path:
+        return self.root / f"{ticker.upper()}.parquet"
+
+    # ---------------------------------------------------------
+    # Local reads / writes
+    # ---------------------------------------------------------
+    def read(self, ticker: str) -> tuple[Optional[pd.DataFrame], dict]:
+        path = self.path(ticker)
+        if not path.exists():
+            return None, {}
+        try:
+            table = pq.read_table(path)
+        except Exception:
+            return None, {}
+        raw = (table.schema.metadata or {}).get(_META_KEY)
+        meta = json.loads(raw) if raw else {}
+        return table.to_pandas(), meta
+
+    def last_bar(self, ticker: str) -> Optional[pd.Timestamp]:
+        df, _ = self.read(ticker)
+        if df is None or df.empty:
+            return None
+        return df.index[-1]
+
+    def write(self, ticker: str, df: pd.DataFrame, meta: dict) -> None:
+        """
+        Writes the whole frame to a temp file and renames it over the old one,
+        so readers never see a half-written file.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_META_KEY] = json.dumps(meta).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        path = self.path(ticker)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+
+    def evict(self, tickers: List[str]) -> int:
+        """
+        Deletes the stored history of tickers that left the universe.
+        Returns how many files were removed.
+        """
+        removed = 0
+        for t in tickers:
+            try:
+                self.path(t).unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    # ---------------------------------------------------------
+    # Gap planning
+    # ---------------------------------------------------------
+    def _fetch_start(self, df, meta, start: dt.date, now: dt.datetime, closed_only: bool = False) -> Optional[dt.date]:
+        """
+        Returns the first date that must be fetched, or None when the stored
+        history is already current. With closed_only, a file checked after the
+        last session close stays current until the next close (no intraday
+        refresh of the live bar).
+        """
+        covered_from = meta.get("covered_from")
+        if df is None or df.empty or not covered_from or dt.date.fromisoformat(covered_from) > start:
+            return start
+
+        checked_at = dt.datetime.fromisoformat(meta["checked_at"]) if meta.get("checked_at") else None
+        close = last_session_close(now)
+        if checked_at is not None and checked_at >= close:
+            if closed_only or not _market_open(now) or now - checked_at < INTRADAY_TTL:
+                return None
+
+        # start at the last final bar, so the answer overlaps one bar whose
+        # close shows whether the provider re-based history (split/dividend)
+        last = df.index[-1].date()
+        last_final = checked_at is not None and checked_at >= dt.datetime.combine(last, MARKET_CLOSE, MARKET_TZ)
+        if last_final or len(df) < 2:
+            return last
+        return df.index[-2].date()
+
+    def _rebased(self, old, new, meta, fetch_start: dt.date) -> bool:
+        """
+        True when the overlapping bar at `fetch_start` (final when stored)
+        no longer matches: the stored history is on an old price basis.
+        """
+        ts = pd.Timestamp(fetch_start)
+        checked_at = meta.get("checked_at")
+        if old is None or new is None or ts not in old.index or ts not in new.index or not checked_at:
+            return False
+        if dt.datetime.fromisoformat(checked_at) < dt.datetime.combine(fetch_start, MARKET_CLOSE, MARKET_TZ):
+            return False
+        for col in ("Close", "Adj Close"):
+            if col in old.columns and col in new.columns:
+                if not math.isclose(float(old.at[ts, col]), float(new.at[ts, col]), rel_tol=ADJUSTMENT_TOLERANCE):
+                    return True
+        return False
+
+    def _merge(self, ticker, old, new, meta, start: dt.date, fetch_start: dt.date, now) -> Optional[pd.DataFrame]:
+        """
+        `new` is the answer's frame, or None when the provider answered with
+        no rows for the ticker (callers skip tickers whose request failed).
+        """
+        if new is None:
+            # nothing new (holiday, bar not published yet): record the check so
+            # the same request is not planned again on every read
+            if old is not None:
+                self.write(ticker, old, {**meta, "checked_at": now.isoformat()})
+            return old
+
+        if old is None or fetch_start <= start:
+            merged = new
+            covered_from = start
+        else:
+            merged = pd.concat([old, new])
+            covered_from = dt.date.fromisoformat(meta["covered_from"])
+
+        merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        self.write(ticker, merged, {"covered_from": covered_from.isoformat(), "checked_at": now.isoformat()})
+        return merged
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def fetch_many(
+        self, tickers: List[str], days: int, closed_only: bool = False
+    ) -> Tuple[Dict[str, pd.DataFrame], Set[str], Set[str]]:
+        """
+        get_many() plus the tickers whose download failed (transport errors
+        or timeouts), as opposed to tickers the provider has no data for,
+        and the tickers left without a frame because their rows came back
+        without the OHLCV columns. The files of both are left untouched, so
+        the next read retries them.
+        """
+        now = _now()
+        start = now.date() - dt.timedelta(days=days)
+
+        stored: Dict[str, tuple] = {}
+        starts: Dict[str, dt.date] = {}
+        for t in tickers:
+            df, meta = self.read(t)
+            stored[t] = (df, meta)
+            fetch_start = self._fetch_start(df, meta, start, now, closed_only)
+            if fetch_start is not None and fetch_start <= now.date():
+                starts[t] = fetch_start
+
+        frames: Dict[str, pd.DataFrame] = {t: df for t, (df, _) in stored.items() if df is not None}
+        fetched, failed, malformed = self._fetch(self._plan(starts, start)) if starts else ({}, set(), set())
+
+        # history re-based since it was stored: replace it with a full window
+        rebased = [
+            t for t, fetch_start in starts.items()
+            if fetch_start > start and self._rebased(stored[t][0], fetched.get(t), stored[t][1], fetch_start)
+        ]
+        if rebased:
+            logger.info("price history re-based for %d tickers, refetching: %s", len(rebased), ", ".join(rebased[:20]))
+            starts.update({t: start for t in rebased})
+            refetched, refailed, remalformed = self._fetch(self._plan({t: start for t in rebased}, start))
+            for t in rebased:
+                fetched.pop(t, None)
+                if t in refetched:
+                    fetched[t] = refetched[t]
+            failed |= refailed
+            malformed |= remalformed
+
+        for t, fetch_start in starts.items():
+            if t in failed or t in malformed:
+                continue
+            old, meta = stored[t]
+            merged = self._merge(t, old, fetched.get(t), meta, start, fetch_start, now)
+            if merged is not None:
+                frames[t] = merged
+
+        cutoff = pd.Timestamp(start)
+        end = pd.Timestamp(last_session_close(now).date()) + pd.Timedelta(days=1) if closed_only else None
+        out: Dict[str, pd.DataFrame] = {}
+        for t, df in frames.items():
+            window = df[df.index >= cutoff]
+            if end is not None:
+                window = window[window.index < end]
+            if not window.empty:
+                out[t] = window
+        return out, failed, malformed - set(out)
+
+    def get_many(self, tickers: List[str], days: int, closed_only: bool = False) -> Dict[str, pd.DataFrame]:
+        """
+        Returns the last `days` calendar days of OHLCV for each ticker,
+        fetching only the bars the store does not have yet.
+
+        closed_only: bars up to the last completed session only, so the
+        result changes once per trading day rather than with the live bar.
+        """
+        return self.fetch_many(tickers, days, closed_only)[0]
+
+    def _plan(self, starts: Dict[str, dt.date], start: dt.date) -> List[tuple]:
+        """
+        One request (fetch_start, chunk, full) per gap start and chunk of
+        batch_size tickers; `full` marks a full-history fetch.
+        """
+        groups: Dict[dt.date, List[str]] = {}
+        for t, fetch_start in starts.items():
+            groups.setdefault(fetch_start, []).append(t)
+        return [
+            (fetch_start, group[i : i + self.batch_size], fetch_start <= start)
+            for fetch_start, group in groups.items()
+            for i in range(0, len(group), self.batch_size)
+        ]
+
+    # ---------------------------------------------------------
+    # Network
+    # ---------------------------------------------------------
+    def _call(
+        self, fetch_start: dt.date, chunk: List[str], full: bool, malformed: Set[str]
+    ) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        One download; None when it failed, {} when it answered with no rows.
+        """
+        try:
+            if self.caller is not None:
+                # deadline, jittered retries and hedging; an empty answer is only
+                # retried on a full-history fetch; after the stored bars it just
+                # means there is nothing new
+                fn = _download_nonempty if full else _download
+                return self.caller.call(fn, chunk, fetch_start, malformed, keys=chunk, limiter=self.limiter)
+            return _download(chunk, fetch_start, malformed)
+        except Exception as e:
+            logger.debug("download failed for %d tickers: %s", len(chunk), e)
+            return None
+
+    def _request(
+        self, fetch_start: dt.date, chunk: List[str], full: bool, malformed: Set[str]
+    ) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Runs one download inside a limiter slot. Only failed requests
+        (exceptions, timeouts) are reported to the limiter as failures; an
+        answer without rows is a normal outcome for an incremental fetch
+        (holiday, bar not published yet) and says nothing about throttling.
+        With a caller, each request it issues (retries, hedges) takes its
+        own slot instead, so none is held through backoff.
+        """
+        if self.limiter is None or self.caller is not None:
+            return self._call(fetch_start, chunk, full, malformed)
+
+        with self.limiter.slot() as outcome:
+            result = self._call(fetch_start, chunk, full, malformed)
+            outcome.ok = result is not None
+        return result
+
+    def _fetch(self, requests: List[tuple]) -> Tuple[Dict[str, pd.DataFrame], Set[str], Set[str]]:
+        """
+        Batch pass, then single-ticker passes for whatever is still missing.
+        Returns the frames, the tickers no request ever got an answer for
+        and those only answered without OHLCV columns; tickers answered
+        without rows are logged rather than dropped silently.
+        """
+        fetched: Dict[str, pd.DataFrame] = {}
+        answered: Set[str] = set()
+        malformed: Set[str] = set()
+        workers = self.limiter.max_limit if self.limiter is not None else self.max_workers
+
+        def run(reqs):
+            for (_, chunk, _), result in zip(reqs, ex.map(lambda req: self._request(*req, malformed), reqs)):
+                if result is not None:
+                    answered.update(chunk)
+                    fetched.update(result)
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            run(requests)
+
+            # per-ticker fallback for symbols a batch dropped (full fetches) or
+            # never got an answer for; with a limiter (and no retrying caller)
+            # they also get extra rounds once it backed off. An incremental
+            # answer without a ticker just means it has no new bars.
+            retrying = self.limiter is not None and self.caller is None
+            pending = [
+                (fetch_start, t, full)
+                for fetch_start, chunk, full in requests
+                if len(chunk) > 1 or retrying
+                for t in chunk
+                if t not in fetched and (full or t not in answered)
+            ]
+            for _ in range(1 + (RETRY_ROUNDS if retrying else 0)):
+                pending = [
+                    (fetch_start, t, full)
+                    for fetch_start, t, full in pending
+                    if t not in fetched and (full or t not in answered)
+                ]
+                if not pending:
+                    break
+                run([(fetch_start, [t], full) for fetch_start, t, full in pending])
+
+        requested = {t for _, chunk, _ in requests for t in chunk}
+        failed = requested - answered - set(fetched)
+        malformed = malformed - set(fetched) - failed
+        missing = sorted(requested - set(fetched) - failed - malformed)
+        if missing:
+            logger.warning("no price data for %d tickers: %s", len(missing), ", ".join(missing[:20]))
+        if malformed:
+            logger.warning("price data without OHLCV columns for %d tickers: %s", len(malformed), ", ".join(sorted(malformed)[:20]))
+        if failed:
+            logger.warning("price download failed for %d tickers: %s", len(failed), ", ".join(sorted(failed)[:20]))
+        return fetched, failed, malformed
+
+    def get_history(self, ticker: str, days: int) -> Optional[pd.DataFrame]:
+        return self.get_many([ticker], days).get(ticker)
+
+    def last_price(self, ticker: str) -> Optional[float]:
+        df = self.get_history(ticker, 10)
+        if df is None or df.empty:
+            return None
+        return float(df["Close"].iloc[-1])
+
+
+_STORE: Optional[PriceStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_price_store() -> PriceStore:
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = PriceStore()
+        return _STORE
@@ -0,0 +1,185 @@
+# utils/reco_store.py
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+RECOS_TABLE = "daily_recommendations"
+RECOS_DB = Path("cache") / "recommendations.sqlite"
+
+# "supabase" (default), "sqlite", or "both" (job writes both, app reads SQLite)
+BACKEND_ENV = "ALPHABEACON_RECOS_BACKEND"
+DB_ENV = "ALPHABEACON_RECOS_DB"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {RECOS_TABLE} (
+    as_of_date  TEXT    NOT NULL,
+    sector      TEXT    NOT NULL,
+    rank        INTEGER NOT NULL,
+    ticker      TEXT    NOT NULL,
+    alpha_score INTEGER,
+    factors     TEXT,
+    targets     TEXT,
+    PRIMARY KEY (as_of_date, sector, rank)
+);
+CREATE INDEX IF NOT EXISTS idx_{RECOS_TABLE}_sector_date_rank
+    ON {RECOS_TABLE} (sector, as_of_date, rank);
+"""
+
+_UPSERT = f"""
+INSERT INTO {RECOS_TABLE} (as_of_date, sector, rank, ticker, alpha_score, factors, targets)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (as_of_date, sector, rank) DO UPDATE SET
+    ticker = excluded.ticker,
+    alpha_score = excluded.alpha_score,
+    factors = excluded.factors,
+    targets = excluded.targets
+"""
+
+
+class SQLiteRecoStore:
+    """
+    daily_recommendations in a local SQLite file (WAL journal), with the same
+    columns as the Supabase table; factors/targets are stored as JSON text.
+    One connection shared behind a lock.
+    """
+
+    def __init__(self, path: Path | str = RECOS_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def upsert(self, rows: List[Dict]) -> None:
+        """
+        Writes all rows in one transaction.
+        """
+        params = [
+            (
+                r["as_of_date"],
+                r["sector"],
+                int(r["rank"]),
+                r["ticker"],
+                int(r["alpha_score"]) if r.get("alpha_score") is not None else None,
+                json.dumps(r.get("factors"), default=float),
+                json.dumps(r.get("targets"), default=float),
+            )
+            for r in rows
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, params)
+
+    def latest_sector_recos(self, sector: str, limit: int = 3) -> Tuple[Optional[str], List[Dict]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT MAX(as_of_date) FROM {RECOS_TABLE} WHERE sector = ?", (sector,)
+            ).fetchone()
+            latest_date = row[0] if row else None
+            if latest_date is None:
+                return None, []
+            cur = self._conn.execute(
+                f"SELECT rank, ticker, alpha_score, factors, targets FROM {RECOS_TABLE} "
+                "WHERE sector = ? AND as_of_date = ? ORDER BY rank LIMIT ?",
+                (sector, latest_date, limit),
+            )
+            rows = cur.fetchall()
+
+        return latest_date, [
+            {
+                "rank": rank,
+                "ticker": ticker,
+                "alpha_score": alpha_score,
+                "factors": json.loads(factors) if factors else {},
+                "targets": json.loads(targets) if targets else {},
+            }
+            for rank, ticker, alpha_score, factors, targets in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SupabaseRecoSource:
+    """
+    Reads daily_recommendations from Supabase (the app's anon client).
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from utils.supabase_client import get_supabase_client
+
+            self._client = get_supabase_client()
+        return self._client
+
+    def latest_sector_recos(self, sector: str, limit: int = 3) -> Tuple[Optional[str], List[Dict]]:
+        sb = self.client
+
+        # 1) get latest date for this sector
+        resp = (
+            sb.table(RECOS_TABLE)
+            .select("as_of_date")
+            .eq("sector", sector)
+            .order("as_of_date", desc=True)
+            .limit(1)
+            .execute()
+        )
+
+        if not resp.data:
+            return None, []
+
+        latest_date = resp.data[0]["as_of_date"]
+
+        # 2) get top N rows for that sector/date
+        resp2 = (
+            sb.table(RECOS_TABLE)
+            .select("rank,ticker,alpha_score,factors,targets")
+            .eq("sector", sector)
+            .eq("as_of_date", latest_date)
+            .order("rank", desc=False)
+            .limit(limit)
+            .execute()
+        )
+
+        return latest_date, (resp2.data or [])
+
+
+def recos_backend() -> str:
+    return os.environ.get(BACKEND_ENV, "supabase").lower()
+
+
+def recos_db_path() -> Path:
+    return Path(os.environ.get(DB_ENV, RECOS_DB))
+
+
+_SQLITE_STORE: Optional[SQLiteRecoStore] = None
+_SQLITE_LOCK = threading.Lock()
+
+
+def get_sqlite_store() -> SQLiteRecoStore:
+    global _SQLITE_STORE
+    with _SQLITE_LOCK:
+        if _SQLITE_STORE is None:
+            _SQLITE_STORE = SQLiteRecoStore(recos_db_path())
+        return _SQLITE_STORE
+
+
+def get_reco_source():
+    """
+    The recommendations backend selected by ALPHABEACON_RECOS_BACKEND.
+    """
+    if recos_backend() in ("sqlite", "both"):
+        return get_sqlite_store()
+    return SupabaseRecoSource()